@@ -1,24 +1,45 @@
 """
 Stripe Webhook Handler - License Generation
 
-This endpoint handles Stripe checkout.session.completed events,
-generates license keys, and sends activation emails to customers.
+This endpoint handles Stripe checkout.session.completed events.
+Verified events are queued for the license worker (lib.license_jobs),
+which generates license keys and sends activation emails to customers.
+When no queue is configured, the event is processed inline.
+
+Set DEBUG_WEBHOOK=1 to enable per-request debug logging.
 """
 
 import os
-import json
+import logging
+import orjson
 import stripe
-import traceback
 import sys
-from datetime import datetime, timedelta
 from http.server import BaseHTTPRequestHandler
 
 # Import library modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from lib.license_generator import generate_license_key, sign_license
-from lib.database import Database
-from lib.email_sender import send_license_email
+from lib.database import get_db
+from lib.http_response import write_response
+from lib.job_queue import enqueue_license_job
+from lib.license_jobs import process_checkout
+from lib.stripe_webhook import construct_event
+
+
+logging.basicConfig(format='%(levelname)s %(name)s: %(message)s')
+log = logging.getLogger('generate_license')
+log.setLevel(logging.DEBUG if os.environ.get('DEBUG_WEBHOOK') else logging.WARNING)
+
+# Configuration, resolved once per process rather than on every request
+_STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
+_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+_SIGNING_KEY = os.environ.get('LICENSE_SIGNING_KEY')
+
+stripe.api_key = _STRIPE_SECRET_KEY
+
+# Stripe event payloads are well below this; larger bodies are rejected
+# before they are read
+MAX_BODY_SIZE = 262144
 
 
 class handler(BaseHTTPRequestHandler):
@@ -30,21 +51,12 @@ class handler(BaseHTTPRequestHandler):
         """Handle POST requests from Stripe webhooks."""
         try:
             # Debug logging - Log incoming request details
-            print(f"🔍 Webhook URL called: /api/generate-license")
-            print(f"📦 Headers: {dict(self.headers)}")
-            print(f"📏 Content-Length: {self.headers.get('Content-Length')}")
-
-            # Get environment variables
-            stripe_api_key = os.environ.get('STRIPE_SECRET_KEY')
-            webhook_secret = os.environ.get('STRIPE_WEBHOOK_SECRET')
-            signing_key = os.environ.get('LICENSE_SIGNING_KEY')
-
-            # Log configuration status
-            print(f"🔐 Stripe-Signature present: {bool(self.headers.get('Stripe-Signature'))}")
-            print(f"🔑 STRIPE_SECRET_KEY configured: {bool(stripe_api_key)}")
-            print(f"🔑 WEBHOOK_SECRET configured: {bool(webhook_secret)}")
-            print(f"🔑 WEBHOOK_SECRET starts with: {webhook_secret[:10] if webhook_secret else 'None'}...")
-            print(f"🔑 LICENSE_SIGNING_KEY configured: {bool(signing_key)}")
+            log.debug("🔍 Webhook URL called: /api/generate-license")
+            log.debug("📦 Headers: %s", self.headers)
+
+            stripe_api_key = _STRIPE_SECRET_KEY
+            webhook_secret = _WEBHOOK_SECRET
+            signing_key = _SIGNING_KEY
 
             if not all([stripe_api_key, webhook_secret, signing_key]):
                 missing = []
@@ -55,188 +67,101 @@ class handler(BaseHTTPRequestHandler):
                 if not signing_key:
                     missing.append('LICENSE_SIGNING_KEY')
                 error_msg = f"Server configuration error: Missing {', '.join(missing)}"
-                print(f"❌ {error_msg}")
+                log.error("❌ %s", error_msg)
                 self._send_error(500, error_msg)
                 return
 
-            # Set Stripe API key
-            stripe.api_key = stripe_api_key
+            # Read request body (bounded, so oversized requests are never buffered)
+            try:
+                content_length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                content_length = -1
+
+            if content_length < 0:
+                self._send_error(400, "Invalid Content-Length")
+                return
+
+            if content_length > MAX_BODY_SIZE:
+                self._send_error(413, "Request body too large")
+                return
 
-            # Read request body
-            content_length = int(self.headers.get('Content-Length', 0))
             payload = self.rfile.read(content_length)
-            print(f"📄 Payload length: {len(payload)} bytes")
-            print(f"📄 Payload preview: {payload[:200] if payload else 'Empty'}...")
+
+            if len(payload) != content_length:
+                self._send_error(400, "Incomplete request body")
+                return
+
+            log.debug("📄 Payload length: %d bytes", len(payload))
 
             # Get Stripe signature header
             sig_header = self.headers.get('Stripe-Signature')
 
             if not sig_header:
                 error_msg = "Missing Stripe signature"
-                print(f"❌ {error_msg}")
-                print(f"Available headers: {list(self.headers.keys())}")
+                log.warning("❌ %s", error_msg)
                 self._send_error(400, error_msg)
                 return
 
-            print(f"✅ Stripe signature present: {sig_header[:50]}...")
-
             # Verify webhook signature
             try:
-                print(f"🔐 Verifying webhook signature...")
-                event = stripe.Webhook.construct_event(
-                    payload, sig_header, webhook_secret
-                )
-                print(f"✅ Webhook signature verified successfully")
-                print(f"📋 Event type: {event.get('type')}")
+                event = construct_event(payload, sig_header, webhook_secret)
+                log.debug("✅ Webhook signature verified, event type: %s", event.get('type'))
             except stripe.error.SignatureVerificationError as e:
-                error_details = traceback.format_exc()
-                print(f"❌ SignatureVerificationError occurred:")
-                print(error_details)
-                print(f"🔍 Webhook secret being used: {webhook_secret[:10]}...")
-                print(f"🔍 Signature header: {sig_header}")
+                log.warning("❌ Webhook signature verification failed: %s", e)
                 self._send_error(400, f"Invalid signature: {str(e)}")
                 return
             except ValueError as e:
-                error_details = traceback.format_exc()
-                print(f"❌ ValueError occurred during webhook verification:")
-                print(error_details)
+                log.warning("❌ Invalid webhook payload: %s", e)
                 self._send_error(400, f"Invalid payload: {str(e)}")
                 return
             except Exception as e:
-                error_details = traceback.format_exc()
-                print(f"❌ Unexpected error during webhook verification:")
-                print(error_details)
+                log.exception("❌ Unexpected error during webhook verification")
                 self._send_error(400, f"Webhook error: {str(e)}")
                 return
 
             # Handle checkout.session.completed event
             if event['type'] == 'checkout.session.completed':
-                print(f"🎯 Processing checkout.session.completed event")
-                session = event['data']['object']
-
-                # Extract customer email from Stripe session
-                # Stripe can put email in different locations depending on checkout configuration
-                customer_email = None
-
-                # Try customer_details first (most common in Checkout Sessions)
-                if session.get('customer_details'):
-                    customer_email = session['customer_details'].get('email')
-                    if customer_email:
-                        print(f"📧 Email found in customer_details: {customer_email}")
-
-                # Fallback to customer_email field (legacy/alternative location)
-                if not customer_email:
-                    customer_email = session.get('customer_email')
-                    if customer_email:
-                        print(f"📧 Email found in customer_email field: {customer_email}")
-
-                # If still no email, check if we have a customer ID
-                customer_id = session.get('customer')
-                subscription_id = session.get('subscription')
-
-                if not customer_email and customer_id:
-                    error_msg = f"No customer email found in session. Customer ID: {customer_id}. Please ensure email collection is enabled in Stripe Checkout."
-                    print(f"❌ {error_msg}")
-                    print(f"Session keys available: {list(session.keys())}")
-                    print(f"Customer details: {session.get('customer_details')}")
-                    self._send_error(400, error_msg)
-                    return
-
-                if not customer_email:
-                    error_msg = "Missing customer email in session"
-                    print(f"❌ {error_msg}")
-                    print(f"Session keys available: {list(session.keys())}")
-                    print(f"Session object: {session}")
-                    self._send_error(400, error_msg)
+                # Hand the event to the license worker and acknowledge right away
+                try:
+                    job = enqueue_license_job(event)
+                except Exception:
+                    log.warning("⚠️  Failed to enqueue license job, processing inline", exc_info=True)
+                    job = None
+
+                if job is not None:
+                    log.debug("📬 License job queued: %s", job.id)
+                    self._send_success({'received': True})
                     return
 
-                print(f"✅ Customer email confirmed: {customer_email}")
-                print(f"👤 Customer ID: {customer_id}")
-                print(f"📋 Subscription ID: {subscription_id}")
-
-                # Extract tier from metadata (set in Stripe checkout)
-                # Default to EARLY_ACCESS tier (unlocks CLI scanning)
-                tier = session.get('metadata', {}).get('tier', 'EARLY_ACCESS')
-                print(f"🏷️  Tier from metadata: {tier}")
-
-                print(f"🔑 Generating license key...")
-                # Generate license key
-                license_key = generate_license_key()
-                print(f"✅ License key generated: {license_key}")
-
-                print(f"🔐 Signing license...")
-                # Generate HMAC signature
-                signature = sign_license(license_key, customer_email, tier, signing_key)
-                print(f"✅ License signed: {signature[:20]}...")
-
-                # Calculate expiration (30 days from now for monthly subscriptions)
-                expires_at = (datetime.utcnow() + timedelta(days=30)).isoformat()
-
-                # Prepare license data for database
-                license_data = {
-                    'license_key': license_key,
-                    'signature': signature,
-                    'email': customer_email,
-                    'tier': tier,
-                    'status': 'ACTIVE',
-                    'stripe_customer_id': customer_id,
-                    'stripe_subscription_id': subscription_id,
-                    'expires_at': expires_at,
-                    'validation_count': 0,
-                    'metadata': {
-                        'stripe_session_id': session.get('id'),
-                        'created_via': 'stripe_webhook'
-                    }
-                }
-
-                # Store license in database
+                # No queue configured - generate the license inline
                 try:
-                    print(f"💾 Storing license in database...")
-                    db = Database()
-                    db.insert_license(license_data)
-                    print(f"✅ License stored successfully in database")
+                    result = process_checkout(event, signing_key)
+                except ValueError as e:
+                    self._send_error(400, str(e))
+                    return
                 except Exception as e:
-                    error_details = traceback.format_exc()
-                    print(f"❌ Database error occurred:")
-                    print(error_details)
-                    print(f"License data: {license_data}")
                     self._send_error(500, f"Database error: {str(e)}")
                     return
 
-                # Send activation email
-                try:
-                    print(f"📧 Sending activation email to {customer_email}...")
-                    send_license_email(customer_email, license_key, tier)
-                    print(f"✅ Email sent successfully")
-                except Exception as e:
-                    # Log error but don't fail the webhook
-                    # License is already created, email can be resent manually
-                    error_details = traceback.format_exc()
-                    print(f"⚠️  Warning: Failed to send email:")
-                    print(error_details)
-
                 # Send success response
-                print(f"🎉 License generation completed successfully!")
                 self._send_success({
                     'message': 'License generated successfully',
-                    'license_key': license_key,
-                    'email': customer_email,
-                    'tier': tier
+                    **result
                 })
 
             # Handle payment failure
             elif event['type'] == 'invoice.payment_failed':
                 invoice = event['data']['object']
                 subscription_id = invoice.get('subscription')
-                customer_email = invoice.get('customer_email')
                 attempt_count = invoice.get('attempt_count', 0)
 
-                print(f"⚠️  Payment failed for subscription: {subscription_id}")
-                print(f"📧 Customer: {customer_email}")
-                print(f"🔄 Attempt count: {attempt_count}")
+                log.debug(
+                    "⚠️  Payment failed for subscription: %s (customer: %s, attempt %s)",
+                    subscription_id, invoice.get('customer_email'), attempt_count
+                )
 
                 try:
-                    db = Database()
+                    db = get_db()
                     license_data = db.get_license_by_subscription(subscription_id)
 
                     if license_data:
@@ -245,20 +170,20 @@ class handler(BaseHTTPRequestHandler):
 
                         # Only suspend if currently active
                         if current_status == 'ACTIVE':
-                            db.update_license_status(license_key, 'SUSPENDED')
-                            print(f"⚠️  License suspended: {license_key}")
-                            print(f"📋 Reason: Payment failed (attempt {attempt_count})")
+                            db.update_license_status(license_key, 'SUSPENDED', return_row=False)
+                            log.info(
+                                "⚠️  License suspended: %s (payment failed, attempt %s)",
+                                license_key, attempt_count
+                            )
                         else:
-                            print(f"ℹ️  License already {current_status}: {license_key}")
+                            log.debug("ℹ️  License already %s: %s", current_status, license_key)
 
                         # TODO: Send warning email to customer about payment failure
                     else:
-                        print(f"⚠️  No license found for subscription: {subscription_id}")
+                        log.warning("⚠️  No license found for subscription: %s", subscription_id)
 
-                except Exception as e:
-                    error_details = traceback.format_exc()
-                    print(f"❌ Error handling payment failure:")
-                    print(error_details)
+                except Exception:
+                    log.exception("❌ Error handling payment failure")
 
                 # Always acknowledge receipt to Stripe
                 self._send_success({'received': True})
@@ -267,32 +192,32 @@ class handler(BaseHTTPRequestHandler):
             elif event['type'] == 'customer.subscription.deleted':
                 subscription = event['data']['object']
                 subscription_id = subscription['id']
-                customer_id = subscription.get('customer')
                 cancel_reason = subscription.get('cancellation_details', {}).get('reason', 'unknown')
 
-                print(f"❌ Subscription canceled: {subscription_id}")
-                print(f"👤 Customer: {customer_id}")
-                print(f"📋 Cancellation reason: {cancel_reason}")
+                log.debug(
+                    "❌ Subscription canceled: %s (customer: %s)",
+                    subscription_id, subscription.get('customer')
+                )
 
                 try:
-                    db = Database()
+                    db = get_db()
                     license_data = db.get_license_by_subscription(subscription_id)
 
                     if license_data:
                         license_key = license_data['license_key']
-                        db.update_license_status(license_key, 'CANCELLED')
+                        db.update_license_status(license_key, 'CANCELLED', return_row=False)
 
-                        print(f"❌ License cancelled: {license_key}")
-                        print(f"📋 Reason: Subscription deleted ({cancel_reason})")
+                        log.info(
+                            "❌ License cancelled: %s (subscription deleted: %s)",
+                            license_key, cancel_reason
+                        )
 
                         # TODO: Send cancellation confirmation email
                     else:
-                        print(f"⚠️  No license found for subscription: {subscription_id}")
+                        log.warning("⚠️  No license found for subscription: %s", subscription_id)
 
-                except Exception as e:
-                    error_details = traceback.format_exc()
-                    print(f"❌ Error handling subscription deletion:")
-                    print(error_details)
+                except Exception:
+                    log.exception("❌ Error handling subscription deletion")
 
                 # Always acknowledge receipt to Stripe
                 self._send_success({'received': True})
@@ -302,14 +227,16 @@ class handler(BaseHTTPRequestHandler):
                 subscription = event['data']['object']
                 subscription_id = subscription['id']
                 status = subscription['status']
-                previous_attributes = event['data'].get('previous_attributes', {})
-                previous_status = previous_attributes.get('status', 'unknown')
 
-                print(f"📋 Subscription updated: {subscription_id}")
-                print(f"📊 Status change: {previous_status} → {status}")
+                log.debug(
+                    "📋 Subscription updated: %s (status: %s → %s)",
+                    subscription_id,
+                    event['data'].get('previous_attributes', {}).get('status', 'unknown'),
+                    status
+                )
 
                 try:
-                    db = Database()
+                    db = get_db()
                     license_data = db.get_license_by_subscription(subscription_id)
 
                     if license_data:
@@ -332,45 +259,38 @@ class handler(BaseHTTPRequestHandler):
 
                         # Only update if status actually changed
                         if new_license_status != current_license_status:
-                            db.update_license_status(license_key, new_license_status)
-                            print(f"📋 License status updated: {license_key}")
-                            print(f"   {current_license_status} → {new_license_status}")
-                            print(f"   Stripe status: {status}")
+                            db.update_license_status(license_key, new_license_status, return_row=False)
+                            log.info(
+                                "📋 License status updated: %s (%s → %s, Stripe status: %s)",
+                                license_key, current_license_status, new_license_status, status
+                            )
                         else:
-                            print(f"ℹ️  License status unchanged: {new_license_status}")
-                            print(f"   (Stripe status: {status})")
+                            log.debug(
+                                "ℹ️  License status unchanged: %s (Stripe status: %s)",
+                                new_license_status, status
+                            )
                     else:
-                        print(f"⚠️  No license found for subscription: {subscription_id}")
+                        log.warning("⚠️  No license found for subscription: %s", subscription_id)
 
-                except Exception as e:
-                    error_details = traceback.format_exc()
-                    print(f"❌ Error handling subscription update:")
-                    print(error_details)
+                except Exception:
+                    log.exception("❌ Error handling subscription update")
 
                 # Always acknowledge receipt to Stripe
                 self._send_success({'received': True})
 
             else:
                 # Unhandled event type
-                print(f"ℹ️  Unhandled event type: {event['type']}")
+                log.debug("ℹ️  Unhandled event type: %s", event['type'])
                 self._send_success({'received': True})
 
         except Exception as e:
-            error_details = traceback.format_exc()
-            print(f"❌ Unexpected error in do_POST:")
-            print(error_details)
+            log.exception("❌ Unexpected error in do_POST")
             self._send_error(500, f"Internal server error: {str(e)}")
 
     def _send_success(self, data: dict):
         """Send successful JSON response."""
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        write_response(self, 200, orjson.dumps(data))
 
     def _send_error(self, status_code: int, message: str):
         """Send error JSON response."""
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps({'error': message}).encode())
+        write_response(self, status_code, orjson.dumps({'error': message}))
@@ -6,16 +6,61 @@ It checks signature validity, license status, and expiration.
 """
 
 import os
-import json
-from datetime import datetime
+import orjson
+import threading
+import time
+from cachetools import TTLCache
 from http.server import BaseHTTPRequestHandler
 
 # Import library modules
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from lib.license_generator import verify_signature
-from lib.database import Database
+from lib.license_generator import LICENSE_KEY_RE, verify_signature
+from lib.database import get_db
+from lib.key_filter import KnownLicenseKeys
+from lib.http_response import CORS_HEADERS, JSON_CONTENT_TYPE, write_response
+
+
+# Resolved once per process rather than on every request
+_SIGNING_KEY = os.environ.get('LICENSE_SIGNING_KEY')
+
+# Validation requests only carry a license key; anything larger is rejected
+# before it is read or parsed
+MAX_BODY_SIZE = 4096
+
+_JSON_CORS_HEADERS = JSON_CONTENT_TYPE + CORS_HEADERS
+
+# CORS preflight headers; Max-Age lets clients reuse a preflight for a day
+_PREFLIGHT_HEADERS = CORS_HEADERS + (
+    b'Access-Control-Allow-Methods: POST, OPTIONS\r\n'
+    b'Access-Control-Allow-Headers: Content-Type\r\n'
+    b'Access-Control-Max-Age: 86400\r\n'
+)
+
+# Licenses that recently validated successfully, keyed by license key, so
+# repeat validations from the same CLI skip the database. Only ACTIVE
+# licenses are cached, so a revocation takes effect within LICENSE_CACHE_TTL
+# seconds on every warm instance. Validations served from the cache are
+# counted in memory and applied at most every BUMP_FLUSH_INTERVAL seconds,
+# so counts from an instance's last few seconds before it is recycled are
+# lost.
+LICENSE_CACHE_TTL = 60
+_license_cache = TTLCache(maxsize=10000, ttl=LICENSE_CACHE_TTL)
+_license_cache_lock = threading.Lock()
+
+# Issued license keys, used to answer unknown keys without a database query
+_known_license_keys = KnownLicenseKeys()
+
+# Pre-encoded bodies for the fixed validation failure responses
+_INVALID_FORMAT_RESPONSE = orjson.dumps({'valid': False, 'error': 'Invalid license key format'})
+_NOT_FOUND_RESPONSE = orjson.dumps({'valid': False, 'error': 'License not found'})
+_INVALID_SIGNATURE_RESPONSE = orjson.dumps({'valid': False, 'error': 'Invalid license signature'})
+_EXPIRED_RESPONSE = orjson.dumps({'valid': False, 'error': 'License has expired'})
+_STATUS_RESPONSES = {
+    status: orjson.dumps({'valid': False, 'error': f'License is {status.lower()}'})
+    for status in ('SUSPENDED', 'CANCELLED')
+}
 
 
 class handler(BaseHTTPRequestHandler):
@@ -26,20 +71,35 @@ class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Handle POST requests for license validation."""
         try:
-            # Get environment variable
-            signing_key = os.environ.get('LICENSE_SIGNING_KEY')
+            signing_key = _SIGNING_KEY
 
             if not signing_key:
                 self._send_error(500, "Server configuration error")
                 return
 
             # Read and parse request body
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length).decode('utf-8')
+            try:
+                content_length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                content_length = -1
+
+            if content_length < 0:
+                self._send_error(400, "Invalid Content-Length")
+                return
+
+            if content_length > MAX_BODY_SIZE:
+                self._send_error(413, "Request body too large")
+                return
+
+            body = self.rfile.read(content_length)
+
+            if len(body) != content_length:
+                self._send_error(400, "Incomplete request body")
+                return
 
             try:
-                data = json.loads(body)
-            except json.JSONDecodeError:
+                data = orjson.loads(body)
+            except orjson.JSONDecodeError:
                 self._send_error(400, "Invalid JSON in request body")
                 return
 
@@ -50,44 +110,43 @@ class handler(BaseHTTPRequestHandler):
                 self._send_error(400, "Missing license_key in request")
                 return
 
-            # Validate license key format
-            if not license_key.startswith('COMPL-') or len(license_key) != 25:
-                self._send_json_response({
-                    'valid': False,
-                    'error': 'Invalid license key format'
-                })
+            # Validate license key format before touching the database
+            if not isinstance(license_key, str) or not LICENSE_KEY_RE.fullmatch(license_key):
+                self._write(200, _INVALID_FORMAT_RESPONSE)
                 return
 
             # Get client information for logging
             ip_address = self.headers.get('X-Forwarded-For', '').split(',')[0].strip()
             user_agent = self.headers.get('User-Agent', '')
 
-            # Query database for license
+            now = time.time()
+
+            # Serve repeat validations from the cache; otherwise query the
+            # database, where active, unexpired licenses have their
+            # validation counter bumped in the same round-trip
             try:
-                db = Database()
-                license_data = db.get_license(license_key)
+                db = get_db()
+
+                with _license_cache_lock:
+                    license_data = _license_cache.get(license_key)
+
+                from_cache = license_data is not None
+
+                if not from_cache:
+                    # Keys that were never issued (e.g. scanners) stop here
+                    if not _known_license_keys.might_exist(license_key):
+                        self._write(200, _NOT_FOUND_RESPONSE)
+                        return
+
+                    license_data = db.validate_and_bump(license_key, int(now))
             except Exception as e:
                 self._send_error(500, f"Database error: {str(e)}")
                 return
 
-            # Check if license exists
+            # Check if license exists. The attempt is not logged: validations
+            # rows reference licenses, so the insert would always fail
             if not license_data:
-                # Log failed validation attempt
-                try:
-                    db.log_validation(
-                        license_key=license_key,
-                        success=False,
-                        ip_address=ip_address,
-                        user_agent=user_agent,
-                        error_message='License not found'
-                    )
-                except Exception:
-                    pass  # Don't fail validation if logging fails
-
-                self._send_json_response({
-                    'valid': False,
-                    'error': 'License not found'
-                })
+                self._write(200, _NOT_FOUND_RESPONSE)
                 return
 
             # Extract license information
@@ -95,8 +154,7 @@ class handler(BaseHTTPRequestHandler):
             tier = license_data.get('tier')
             status = license_data.get('status')
             signature = license_data.get('signature')
-            expires_at = license_data.get('expires_at')
-            validation_count = license_data.get('validation_count', 0)
+            expires_at_epoch = license_data.get('expires_at_epoch')
 
             # Verify HMAC signature
             if not verify_signature(license_key, email, tier, signature, signing_key):
@@ -112,10 +170,7 @@ class handler(BaseHTTPRequestHandler):
                 except Exception:
                     pass
 
-                self._send_json_response({
-                    'valid': False,
-                    'error': 'Invalid license signature'
-                })
+                self._write(200, _INVALID_SIGNATURE_RESPONSE)
                 return
 
             # Check license status
@@ -132,44 +187,48 @@ class handler(BaseHTTPRequestHandler):
                 except Exception:
                     pass
 
-                self._send_json_response({
-                    'valid': False,
-                    'error': f'License is {status.lower()}'
-                })
+                response = _STATUS_RESPONSES.get(status)
+                if response is None:
+                    response = orjson.dumps({'valid': False, 'error': f'License is {status.lower()}'})
+
+                self._write(200, response)
                 return
 
             # Check expiration
-            if expires_at:
+            if expires_at_epoch and now > expires_at_epoch:
+                # Log failed validation attempt
                 try:
-                    expiry_date = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
-                    if datetime.utcnow() > expiry_date:
-                        # Log failed validation attempt
-                        try:
-                            db.log_validation(
-                                license_key=license_key,
-                                success=False,
-                                ip_address=ip_address,
-                                user_agent=user_agent,
-                                error_message='License expired'
-                            )
-                        except Exception:
-                            pass
-
-                        self._send_json_response({
-                            'valid': False,
-                            'error': 'License has expired'
-                        })
-                        return
-                except Exception as e:
-                    # If we can't parse the date, log but don't fail validation
-                    print(f"Warning: Failed to parse expiry date: {str(e)}")
+                    db.log_validation(
+                        license_key=license_key,
+                        success=False,
+                        ip_address=ip_address,
+                        user_agent=user_agent,
+                        error_message='License expired'
+                    )
+                except Exception:
+                    pass
 
-            # License is valid - update validation metadata
-            try:
-                db.update_license_validation(license_key, validation_count + 1)
-            except Exception as e:
-                # Don't fail validation if update fails
-                print(f"Warning: Failed to update validation metadata: {str(e)}")
+                self._write(200, _EXPIRED_RESPONSE)
+                return
+
+            # License is valid - count cache hits (database hits were counted
+            # by validate_and_bump), and cache the license unless it expires
+            # before the cache entry would
+            if from_cache:
+                try:
+                    db.bump_validation_count(license_key)
+                except Exception as e:
+                    # Don't fail validation if update fails
+                    print(f"Warning: Failed to update validation metadata: {str(e)}")
+            elif not expires_at_epoch or expires_at_epoch - now >= LICENSE_CACHE_TTL:
+                with _license_cache_lock:
+                    _license_cache[license_key] = {
+                        'email': email,
+                        'tier': tier,
+                        'status': status,
+                        'signature': signature,
+                        'expires_at_epoch': expires_at_epoch
+                    }
 
             # Log successful validation
             try:
@@ -191,29 +250,25 @@ class handler(BaseHTTPRequestHandler):
                 'status': status
             })
 
+            # Apply cached validations' counts while this instance still runs
+            if from_cache:
+                db.flush_due_validation_counts()
+
         except Exception as e:
             self._send_error(500, f"Internal server error: {str(e)}")
 
     def do_OPTIONS(self):
         """Handle CORS preflight requests."""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
+        write_response(self, 204, b'', _PREFLIGHT_HEADERS)
 
     def _send_json_response(self, data: dict):
         """Send successful JSON response with CORS headers."""
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self._write(200, orjson.dumps(data))
 
     def _send_error(self, status_code: int, message: str):
         """Send error JSON response with CORS headers."""
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps({'error': message}).encode())
+        self._write(status_code, orjson.dumps({'error': message}))
+
+    def _write(self, status_code: int, body: bytes):
+        """Write a JSON response with CORS headers in a single write."""
+        write_response(self, status_code, body, _JSON_CORS_HEADERS)
@@ -0,0 +1,123 @@
+-- ============================================================================
+-- Complio Backend - Migration for Existing Databases
+-- ============================================================================
+-- Brings a database created from an earlier version of schema.sql up to
+-- date. schema.sql itself is for new databases only: re-running it fails
+-- at CREATE POLICY, before the functions the API relies on are created.
+--
+-- Run this in the Supabase SQL Editor before deploying the API. Every
+-- statement is idempotent, so it is safe to run more than once.
+-- ============================================================================
+
+BEGIN;
+
+-- ============================================================================
+-- licenses.expires_at_epoch
+-- ============================================================================
+-- Read by the validation API (LICENSE_COLS and validate_and_bump) and kept
+-- in sync with expires_at by trigger_set_expires_at_epoch
+-- ============================================================================
+
+ALTER TABLE licenses ADD COLUMN IF NOT EXISTS expires_at_epoch BIGINT;
+
+CREATE OR REPLACE FUNCTION set_expires_at_epoch()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.expires_at_epoch = EXTRACT(EPOCH FROM NEW.expires_at)::BIGINT;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_set_expires_at_epoch ON licenses;
+CREATE TRIGGER trigger_set_expires_at_epoch
+    BEFORE INSERT OR UPDATE OF expires_at ON licenses
+    FOR EACH ROW
+    EXECUTE FUNCTION set_expires_at_epoch();
+
+-- Backfill rows written before the column or the trigger existed
+UPDATE licenses
+SET expires_at_epoch = EXTRACT(EPOCH FROM expires_at)::BIGINT
+WHERE expires_at_epoch IS DISTINCT FROM EXTRACT(EPOCH FROM expires_at)::BIGINT;
+
+COMMENT ON COLUMN licenses.expires_at_epoch IS 'Expiration as Unix timestamp (seconds), derived from expires_at by trigger';
+
+-- ============================================================================
+-- last_validated_at
+-- ============================================================================
+-- Now set by validate_and_bump and bump_validation_counts; the trigger on
+-- validations updated the license row once per successful validation logged
+-- ============================================================================
+
+DROP TRIGGER IF EXISTS trigger_update_last_validated_at ON validations;
+DROP FUNCTION IF EXISTS update_last_validated_at();
+
+-- ============================================================================
+-- Validation functions
+-- ============================================================================
+-- Same definitions as in schema.sql
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION bump_validation_counts(license_keys TEXT[], deltas INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    UPDATE licenses
+    SET validation_count = COALESCE(licenses.validation_count, 0) + v.delta,
+        last_validated_at = NOW()
+    FROM UNNEST(license_keys, deltas) AS v(license_key, delta)
+    WHERE licenses.license_key = v.license_key;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION validate_and_bump(_license_key TEXT, _now_epoch BIGINT)
+RETURNS SETOF licenses AS $$
+BEGIN
+    RETURN QUERY
+    WITH bumped AS (
+        UPDATE licenses
+        SET validation_count = COALESCE(validation_count, 0) + 1,
+            last_validated_at = NOW()
+        WHERE license_key = _license_key
+          AND status = 'ACTIVE'
+          AND (expires_at_epoch IS NULL OR expires_at_epoch > _now_epoch)
+        RETURNING *
+    )
+    SELECT * FROM bumped
+    UNION ALL
+    SELECT * FROM licenses
+    WHERE license_key = _license_key
+      AND NOT EXISTS (SELECT 1 FROM bumped);
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION bump_validation_counts(TEXT[], INTEGER[]) TO service_role;
+GRANT EXECUTE ON FUNCTION validate_and_bump(TEXT, BIGINT) TO service_role;
+
+-- ============================================================================
+-- One license per checkout session
+-- ============================================================================
+-- Used by license generation to detect an already processed checkout, and
+-- unique so two concurrent attempts cannot both create a license. Fails if
+-- licenses already share a session; list them with
+--   SELECT metadata->>'stripe_session_id', array_agg(license_key)
+--   FROM licenses
+--   WHERE metadata ? 'stripe_session_id'
+--   GROUP BY 1 HAVING COUNT(*) > 1;
+-- ============================================================================
+
+-- Replace the earlier non-unique index of the same name
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'idx_licenses_stripe_session'
+          AND NOT i.indisunique
+    ) THEN
+        DROP INDEX idx_licenses_stripe_session;
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_licenses_stripe_session ON licenses((metadata->>'stripe_session_id'));
+
+COMMIT;
@@ -3,6 +3,8 @@
 -- ============================================================================
 -- This schema defines the database structure for the Complio licensing system
 -- Run this in the Supabase SQL Editor to set up your database
+-- To upgrade a database created from an earlier version of this file, run
+-- migration.sql instead
 -- ============================================================================
 
 -- Enable UUID extension (required for UUID primary keys)
@@ -19,7 +21,7 @@ CREATE TABLE IF NOT EXISTS licenses (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
 
     -- License information
-    license_key VARCHAR(24) UNIQUE NOT NULL,
+    license_key VARCHAR(25) UNIQUE NOT NULL,
     signature VARCHAR(64) NOT NULL,
 
     -- Customer information
@@ -34,6 +36,9 @@ CREATE TABLE IF NOT EXISTS licenses (
     -- Timestamps
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     expires_at TIMESTAMP WITH TIME ZONE,
+    -- expires_at as a Unix timestamp, compared directly by the validation API
+    -- (kept in sync with expires_at by trigger_set_expires_at_epoch)
+    expires_at_epoch BIGINT,
     last_validated_at TIMESTAMP WITH TIME ZONE,
 
     -- Usage tracking
@@ -54,6 +59,9 @@ CREATE INDEX IF NOT EXISTS idx_licenses_status ON licenses(status);
 CREATE INDEX IF NOT EXISTS idx_licenses_stripe_customer ON licenses(stripe_customer_id);
 CREATE INDEX IF NOT EXISTS idx_licenses_stripe_subscription ON licenses(stripe_subscription_id);
 CREATE INDEX IF NOT EXISTS idx_licenses_created_at ON licenses(created_at DESC);
+-- At most one license per Stripe Checkout session, so a redelivered or
+-- retried checkout event cannot create a second license
+CREATE UNIQUE INDEX IF NOT EXISTS idx_licenses_stripe_session ON licenses((metadata->>'stripe_session_id'));
 
 -- ============================================================================
 -- TABLE: validations
@@ -67,7 +75,7 @@ CREATE TABLE IF NOT EXISTS validations (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
 
     -- License being validated
-    license_key VARCHAR(24) NOT NULL,
+    license_key VARCHAR(25) NOT NULL,
 
     -- Timestamp
     validated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
@@ -128,23 +136,66 @@ CREATE POLICY "Service role has full access to validations"
 -- Helper functions for common operations
 -- ============================================================================
 
--- Function to automatically update last_validated_at timestamp
-CREATE OR REPLACE FUNCTION update_last_validated_at()
+-- last_validated_at is set by validate_and_bump and bump_validation_counts,
+-- not by a trigger on validations: that trigger ran one UPDATE of the
+-- license row per successful validation logged
+
+-- Function to derive expires_at_epoch from expires_at, so every writer
+-- (API, backfills, dashboard edits) keeps the two columns in sync
+CREATE OR REPLACE FUNCTION set_expires_at_epoch()
 RETURNS TRIGGER AS $$
 BEGIN
-    UPDATE licenses
-    SET last_validated_at = NOW()
-    WHERE license_key = NEW.license_key AND NEW.success = true;
+    NEW.expires_at_epoch = EXTRACT(EPOCH FROM NEW.expires_at)::BIGINT;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger to update last_validated_at when a successful validation is logged
-CREATE TRIGGER trigger_update_last_validated_at
-    AFTER INSERT ON validations
+-- Trigger to set expires_at_epoch whenever expires_at is written
+DROP TRIGGER IF EXISTS trigger_set_expires_at_epoch ON licenses;
+CREATE TRIGGER trigger_set_expires_at_epoch
+    BEFORE INSERT OR UPDATE OF expires_at ON licenses
     FOR EACH ROW
-    WHEN (NEW.success = true)
-    EXECUTE FUNCTION update_last_validated_at();
+    EXECUTE FUNCTION set_expires_at_epoch();
+
+-- Function to apply batched validation counter increments
+-- Called by the API with the increments accumulated since the last flush.
+-- Written in PL/pgSQL (like the functions below) so the statement plan is
+-- prepared once and cached for the lifetime of each pooled connection.
+CREATE OR REPLACE FUNCTION bump_validation_counts(license_keys TEXT[], deltas INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    UPDATE licenses
+    SET validation_count = COALESCE(licenses.validation_count, 0) + v.delta,
+        last_validated_at = NOW()
+    FROM UNNEST(license_keys, deltas) AS v(license_key, delta)
+    WHERE licenses.license_key = v.license_key;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function used by the validation API to read a license and, if it is active
+-- and not expired, bump its validation counter in the same round-trip.
+-- Returns the license row (pre-update values for inactive licenses), or no
+-- row if the license key does not exist.
+CREATE OR REPLACE FUNCTION validate_and_bump(_license_key TEXT, _now_epoch BIGINT)
+RETURNS SETOF licenses AS $$
+BEGIN
+    RETURN QUERY
+    WITH bumped AS (
+        UPDATE licenses
+        SET validation_count = COALESCE(validation_count, 0) + 1,
+            last_validated_at = NOW()
+        WHERE license_key = _license_key
+          AND status = 'ACTIVE'
+          AND (expires_at_epoch IS NULL OR expires_at_epoch > _now_epoch)
+        RETURNING *
+    )
+    SELECT * FROM bumped
+    UNION ALL
+    SELECT * FROM licenses
+    WHERE license_key = _license_key
+      AND NOT EXISTS (SELECT 1 FROM bumped);
+END;
+$$ LANGUAGE plpgsql;
 
 -- ============================================================================
 -- VIEWS
@@ -237,6 +288,10 @@ GRANT ALL ON validations TO service_role;
 -- Grant permissions on sequences (for auto-increment)
 GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO service_role;
 
+-- Grant permissions on functions
+GRANT EXECUTE ON FUNCTION bump_validation_counts(TEXT[], INTEGER[]) TO service_role;
+GRANT EXECUTE ON FUNCTION validate_and_bump(TEXT, BIGINT) TO service_role;
+
 -- Grant permissions on views
 GRANT SELECT ON active_licenses_summary TO service_role;
 GRANT SELECT ON validation_statistics TO service_role;
@@ -249,10 +304,11 @@ GRANT SELECT ON recent_validations TO service_role;
 -- ============================================================================
 
 COMMENT ON TABLE licenses IS 'Stores all Complio license keys and metadata';
-COMMENT ON COLUMN licenses.license_key IS 'Unique license key in format COMPL-XXXX-XXXX-XXXX-XXXX';
+COMMENT ON COLUMN licenses.license_key IS 'Unique license key in format COMPL1-XXXX-XXXX-XXXXX (Crockford base32), or legacy COMPL-XXXX-XXXX-XXXX-XXXX (hex)';
 COMMENT ON COLUMN licenses.signature IS 'HMAC-SHA256 signature for license verification';
 COMMENT ON COLUMN licenses.tier IS 'License tier: EARLY_ACCESS, STARTER, PRO, or ENTERPRISE';
 COMMENT ON COLUMN licenses.status IS 'License status: ACTIVE, SUSPENDED, or CANCELLED';
+COMMENT ON COLUMN licenses.expires_at_epoch IS 'Expiration as Unix timestamp (seconds), derived from expires_at by trigger';
 COMMENT ON COLUMN licenses.validation_count IS 'Number of times this license has been validated';
 
 COMMENT ON TABLE validations IS 'Audit log of all license validation attempts';
@@ -3,14 +3,144 @@ Supabase Database Client
 
 This module provides a wrapper around the Supabase client for
 license management operations.
+
+Use get_db() to obtain the shared Database instance: the underlying
+Supabase client (and its HTTP connection pool) is created once per
+process and reused across warm invocations.
+
+Validation audit logs and validation counter increments are buffered in
+memory and written in batches by a background thread, so neither adds a
+round-trip to a validation request.
 """
 
+import atexit
 import os
-from datetime import datetime
-from typing import Dict, Any, Optional
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Any, Iterable, List, Optional
+from urllib.parse import quote
+import httpx
+import orjson
 from supabase import create_client, Client
 
 
+# Validation log buffering: rows are flushed every LOG_FLUSH_INTERVAL seconds,
+# or sooner once LOG_BATCH_SIZE rows are waiting. When the buffer is full,
+# new rows are dropped rather than blocking validation requests.
+LOG_BATCH_SIZE = 500
+LOG_FLUSH_INTERVAL = 1.0
+LOG_QUEUE_SIZE = 10000
+
+_log_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_log_wakeup = threading.Event()
+
+# Validation counter increments accumulated per license key and applied
+# with one bulk UPDATE every BUMP_FLUSH_INTERVAL seconds
+BUMP_FLUSH_INTERVAL = 5.0
+
+_bumps: Dict[str, int] = defaultdict(int)
+_bumps_lock = threading.Lock()
+_last_bump_flush = time.monotonic()
+
+_flusher: Optional[threading.Thread] = None
+_flusher_lock = threading.Lock()
+
+# License statuses accepted by update_license_status
+VALID_STATUSES = frozenset({'ACTIVE', 'SUSPENDED', 'CANCELLED'})
+_VALID_STATUSES_ERR = "Must be one of ACTIVE, SUSPENDED, CANCELLED"
+
+# Supabase credentials, resolved once per process
+_SUPABASE_URL = os.environ.get('SUPABASE_URL')
+_SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY')
+
+# Maximum rows sent in one multi-row INSERT by the bulk insert methods
+INSERT_CHUNK_SIZE = 1000
+
+# PostgREST statuses for an insert rejected by a table constraint (400 for
+# check and not-null violations, 409 for foreign key and unique violations)
+_CONSTRAINT_ERROR_STATUSES = frozenset({400, 409})
+
+# Headers for bulk inserts posted directly to PostgREST (see _insert_rows)
+_BULK_INSERT_HEADERS = {
+    'Content-Type': 'application/json',
+    'Prefer': 'return=minimal'
+}
+
+# Maximum keys per multi-get request, keeping the URL within PostgREST limits
+LOOKUP_CHUNK_SIZE = 500
+
+# Columns returned by license lookups (metadata and bookkeeping columns
+# are not needed by any caller and are left out of the response)
+LICENSE_COLS = (
+    'license_key,signature,email,tier,status,expires_at,expires_at_epoch,'
+    'validation_count,stripe_customer_id,stripe_subscription_id'
+)
+
+# Single-license lookup path on the PostgREST endpoint, completed with a
+# "<column>=eq.<value>" filter (see _lookup_license)
+_LICENSE_LOOKUP_PATH = f'/licenses?select={LICENSE_COLS}&limit=1&'
+
+# PostgREST connection pool. Connections are kept alive between requests
+# (and warm invocations) so calls skip the TCP/TLS handshake; the pool
+# stays well below the Supabase pooler's client connection limit.
+DB_MAX_CONNECTIONS = 10
+DB_KEEPALIVE_EXPIRY = 1800
+DB_TIMEOUT = httpx.Timeout(10.0, connect=2.0)
+
+
+# Methods that are safe to resend when the connection drops mid-request
+_IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD'})
+
+
+class _RetryingTransport(httpx.HTTPTransport):
+    """
+    HTTP transport that retries a read once if the connection drops.
+
+    A kept-alive connection may have been closed by the server while
+    idle; the failure only shows up as RemoteProtocolError on reuse. The
+    same error is raised when the server closed the connection after
+    processing the request, so writes (inserts, RPC calls) are never
+    resent - that could apply them twice.
+    """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return super().handle_request(request)
+        except httpx.RemoteProtocolError:
+            if request.method not in _IDEMPOTENT_METHODS:
+                raise
+            return super().handle_request(request)
+
+
+# Millisecond and ISO 8601 string of the last _iso_now() call
+_iso_cache = (0, '')
+
+
+def _iso_now() -> str:
+    """
+    Return the current UTC time as an ISO 8601 string (millisecond precision).
+
+    The formatted string is reused for every call within the same
+    millisecond, so bursts of validation writes format it once.
+    """
+    global _iso_cache
+
+    now_ms = time.time_ns() // 1_000_000
+    cached_ms, cached = _iso_cache
+
+    if now_ms != cached_ms:
+        cached = datetime.fromtimestamp(now_ms / 1000, timezone.utc).isoformat(
+            timespec='milliseconds'
+        )
+        _iso_cache = (now_ms, cached)
+
+    return cached
+
+
 class Database:
     """
     Database wrapper for Supabase operations.
@@ -21,17 +151,39 @@ class Database:
 
     def __init__(self):
         """Initialize Supabase client with service role credentials."""
-        supabase_url = os.environ.get('SUPABASE_URL')
-        supabase_key = os.environ.get('SUPABASE_SERVICE_KEY')
-
-        if not supabase_url or not supabase_key:
+        if not _SUPABASE_URL or not _SUPABASE_SERVICE_KEY:
             raise ValueError(
                 "SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment"
             )
 
-        self.client: Client = create_client(supabase_url, supabase_key)
+        self.client: Client = create_client(_SUPABASE_URL, _SUPABASE_SERVICE_KEY)
+        self._use_connection_pool()
+
+    def _use_connection_pool(self) -> None:
+        """Replace the PostgREST HTTP session with a tuned, pooled one."""
+        postgrest = self.client.postgrest
+        session = postgrest.session
+
+        postgrest.session = httpx.Client(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=DB_TIMEOUT,
+            follow_redirects=True,
+            transport=_RetryingTransport(
+                limits=httpx.Limits(
+                    max_connections=DB_MAX_CONNECTIONS,
+                    max_keepalive_connections=DB_MAX_CONNECTIONS,
+                    keepalive_expiry=DB_KEEPALIVE_EXPIRY
+                )
+            )
+        )
+        session.close()
 
-    def insert_license(self, license_data: Dict[str, Any]) -> Dict[str, Any]:
+    def insert_license(
+        self,
+        license_data: Dict[str, Any],
+        return_row: bool = True
+    ) -> Optional[Dict[str, Any]]:
         """
         Insert a new license into the database.
 
@@ -46,14 +198,23 @@ class Database:
                 - stripe_subscription_id: Stripe subscription ID
                 - expires_at: Expiration timestamp (optional)
                 - metadata: Additional metadata (optional)
+            return_row: Return the inserted record (default: True). When
+                False, PostgREST does not send the row back.
 
         Returns:
-            Dict containing the inserted license record
+            Dict containing the inserted license record, or None if
+            return_row is False
 
         Raises:
             Exception: If database insert fails
         """
         try:
+            if not return_row:
+                self.client.table('licenses').insert(
+                    license_data, returning='minimal'
+                ).execute()
+                return None
+
             response = self.client.table('licenses').insert(license_data).execute()
 
             if response.data:
@@ -64,6 +225,66 @@ class Database:
         except Exception as e:
             raise Exception(f"Database insert failed: {str(e)}")
 
+    def insert_licenses(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert many licenses, e.g. for a backfill.
+
+        Rows are sent as multi-row inserts of up to INSERT_CHUNK_SIZE rows
+        without reading the inserted records back.
+
+        Args:
+            rows: License dictionaries, as accepted by insert_license
+
+        Returns:
+            Number of licenses inserted
+
+        Raises:
+            Exception: If database insert fails (earlier chunks stay inserted)
+        """
+        try:
+            return self._insert_rows('licenses', rows)
+        except Exception as e:
+            raise Exception(f"Database insert failed: {str(e)}")
+
+    def _insert_rows(self, table: str, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert rows into a table in chunks of INSERT_CHUNK_SIZE.
+
+        Each chunk is serialized with orjson and posted straight to the
+        PostgREST endpoint on the client's pooled session, rather than
+        through the query builder, which encodes with the stdlib json.
+
+        Returns:
+            Number of rows inserted
+
+        Raises:
+            httpx.HTTPStatusError: If PostgREST rejects a chunk
+            Exception: If the request fails
+        """
+        session = self.client.postgrest.session
+        rows = iter(rows)
+        inserted = 0
+
+        while True:
+            chunk = list(islice(rows, INSERT_CHUNK_SIZE))
+            if not chunk:
+                return inserted
+
+            response = session.post(
+                f'/{table}',
+                content=orjson.dumps(chunk),
+                headers=_BULK_INSERT_HEADERS
+            )
+
+            if response.is_error:
+                raise httpx.HTTPStatusError(
+                    f"PostgREST error {response.status_code}: {response.text}",
+                    request=response.request,
+                    response=response
+                )
+
+            inserted += len(chunk)
+
     def get_license(self, license_key: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve a license by license key.
@@ -77,10 +298,139 @@ class Database:
         Raises:
             Exception: If database query fails
         """
+        return self._lookup_license('license_key', license_key)
+
+    def get_licenses_by_keys(self, license_keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieve many licenses by license key.
+
+        Keys are looked up with one `license_key IN (...)` query per
+        LOOKUP_CHUNK_SIZE keys.
+
+        Args:
+            license_keys: The license keys to query
+
+        Returns:
+            Dict mapping each license key found to its license data;
+            keys that do not exist are omitted
+
+        Raises:
+            Exception: If database query fails
+        """
+        license_keys = iter(license_keys)
+        licenses: Dict[str, Dict[str, Any]] = {}
+
         try:
-            response = self.client.table('licenses').select('*').eq(
-                'license_key', license_key
-            ).execute()
+            while True:
+                chunk = list(islice(license_keys, LOOKUP_CHUNK_SIZE))
+                if not chunk:
+                    break
+
+                response = self.client.table('licenses').select(LICENSE_COLS).in_(
+                    'license_key', chunk
+                ).execute()
+
+                for license_data in response.data or []:
+                    licenses[license_data['license_key']] = license_data
+
+        except Exception as e:
+            raise Exception(f"Database query failed: {str(e)}")
+
+        return licenses
+
+    def _lookup_license(self, column: str, value: str) -> Optional[Dict[str, Any]]:
+        """Fetch the license whose column equals value, or None if there is none."""
+        # e.g. invoices without a subscription carry no subscription ID
+        if not value:
+            return None
+
+        # GET the precomputed lookup URL directly on the pooled session and
+        # decode with orjson, instead of building a postgrest-py query
+        try:
+            response = self.client.postgrest.session.get(
+                f'{_LICENSE_LOOKUP_PATH}{column}=eq.{quote(value, safe="")}'
+            )
+
+            if response.is_error:
+                raise Exception(f"PostgREST error {response.status_code}: {response.text}")
+
+            rows = orjson.loads(response.content)
+        except Exception as e:
+            raise Exception(f"Database query failed: {str(e)}")
+
+        return rows[0] if rows else None
+
+    def get_license_keys(
+        self,
+        created_since: Optional[str] = None,
+        page_size: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        List license keys with their creation timestamps.
+
+        Results are fetched in pages ordered by license_key, each page
+        starting after the last key of the previous one, so this also
+        works for tables larger than PostgREST's max rows per response.
+        Paging stops at the first empty page, as PostgREST may return
+        fewer than page_size rows per page (max_rows).
+
+        Args:
+            created_since: Only return licenses created at or after this
+                ISO timestamp (optional)
+            page_size: Number of rows fetched per request
+
+        Returns:
+            List of dicts with license_key and created_at, ordered by
+            license_key
+
+        Raises:
+            Exception: If database query fails
+        """
+        rows: List[Dict[str, Any]] = []
+
+        try:
+            while True:
+                query = self.client.table('licenses').select('license_key,created_at')
+                if created_since:
+                    query = query.gte('created_at', created_since)
+                if rows:
+                    query = query.gt('license_key', rows[-1]['license_key'])
+
+                response = query.order('license_key').limit(page_size).execute()
+
+                if not response.data:
+                    return rows
+
+                rows.extend(response.data)
+
+        except Exception as e:
+            raise Exception(f"Database query failed: {str(e)}")
+
+    def validate_and_bump(self, license_key: str, now_epoch: int) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a license for validation and count the validation.
+
+        This runs the validate_and_bump database function, which returns
+        the license row and, when the license is ACTIVE and not expired
+        at now_epoch, increments validation_count and sets
+        last_validated_at in the same statement - one round-trip instead
+        of a read followed by an update.
+
+        Args:
+            license_key: The license key to validate
+            now_epoch: Current time as a Unix timestamp (seconds)
+
+        Returns:
+            Dict containing license data, or None if not found
+
+        Raises:
+            Exception: If database query fails
+        """
+        try:
+            response = self.client.rpc('validate_and_bump', {
+                '_license_key': license_key,
+                '_now_epoch': now_epoch
+            }).execute()
 
             if response.data and len(response.data) > 0:
                 return response.data[0]
@@ -93,8 +443,9 @@ class Database:
     def update_license_validation(
         self,
         license_key: str,
-        validation_count: int
-    ) -> Dict[str, Any]:
+        validation_count: int,
+        return_row: bool = True
+    ) -> Optional[Dict[str, Any]]:
         """
         Update license validation metadata.
 
@@ -104,19 +455,28 @@ class Database:
         Args:
             license_key: The license key to update
             validation_count: New validation count
+            return_row: Return the updated record (default: True). When
+                False, PostgREST does not send the row back.
 
         Returns:
-            Dict containing the updated license record
+            Dict containing the updated license record, or None if
+            return_row is False
 
         Raises:
             Exception: If database update fails
         """
         try:
             update_data = {
-                'last_validated_at': datetime.utcnow().isoformat(),
+                'last_validated_at': _iso_now(),
                 'validation_count': validation_count
             }
 
+            if not return_row:
+                self.client.table('licenses').update(
+                    update_data, returning='minimal'
+                ).eq('license_key', license_key).execute()
+                return None
+
             response = self.client.table('licenses').update(update_data).eq(
                 'license_key', license_key
             ).execute()
@@ -141,7 +501,9 @@ class Database:
         Log a license validation attempt.
 
         This creates an audit trail of all validation attempts for
-        security monitoring and analytics.
+        security monitoring and analytics. The row is queued and written
+        by a background thread (see flush_validation_logs), so this call
+        never waits on the database.
 
         Args:
             license_key: The license key being validated
@@ -151,32 +513,197 @@ class Database:
             error_message: Error message if validation failed (optional)
 
         Returns:
-            Dict containing the inserted validation log record
+            Dict containing the queued validation log record, or an empty
+            dict if the log buffer is full and the record was dropped
+        """
+        log_data = {
+            'license_key': license_key,
+            'validated_at': _iso_now(),
+            'success': success,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'error_message': error_message
+        }
+
+        self._start_flusher()
+
+        try:
+            _log_queue.put_nowait(log_data)
+        except queue.Full:
+            # Don't fail validation if logging fails - just log the error
+            print("Warning: Validation log buffer full, dropping record")
+            return {}
+
+        if _log_queue.qsize() >= LOG_BATCH_SIZE:
+            _log_wakeup.set()
+
+        return log_data
+
+    def log_validations(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Write many validation log records directly.
+
+        Rows are sent as multi-row inserts of up to INSERT_CHUNK_SIZE rows.
+        Unlike log_validation, this waits for the database.
+
+        Args:
+            rows: Validation log dictionaries with the fields built by
+                log_validation
+
+        Returns:
+            Number of log records written
 
         Raises:
-            Exception: If database insert fails
+            Exception: If database insert fails (earlier chunks stay inserted)
         """
         try:
-            log_data = {
-                'license_key': license_key,
-                'validated_at': datetime.utcnow().isoformat(),
-                'success': success,
-                'ip_address': ip_address,
-                'user_agent': user_agent,
-                'error_message': error_message
-            }
+            return self._insert_rows('validations', rows)
+        except Exception as e:
+            raise Exception(f"Database insert failed: {str(e)}")
 
-            response = self.client.table('validations').insert(log_data).execute()
+    def flush_validation_logs(self) -> int:
+        """
+        Write all buffered validation logs to the database.
 
-            if response.data:
-                return response.data[0]
-            else:
-                raise Exception("Failed to log validation: No data returned")
+        Rows are sent as multi-row inserts of up to LOG_BATCH_SIZE rows.
+        This is called periodically by the background flusher and once
+        at interpreter exit.
 
+        Returns:
+            Number of log records written
+        """
+        written = 0
+
+        while True:
+            rows = []
+            while len(rows) < LOG_BATCH_SIZE:
+                try:
+                    rows.append(_log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if not rows:
+                return written
+
+            try:
+                written += self._insert_rows('validations', rows)
+                continue
+            except httpx.HTTPStatusError as e:
+                print(f"Warning: Batched validation logging failed: {str(e)}")
+                if e.response.status_code not in _CONSTRAINT_ERROR_STATUSES:
+                    continue
+            except Exception as e:
+                # e.g. the database is unreachable; retrying row by row
+                # would only add one timeout per row
+                print(
+                    f"Warning: Batched validation logging failed, "
+                    f"dropping {len(rows)} record(s): {str(e)}"
+                )
+                continue
+
+            # A single row rejected by a constraint fails the whole batch,
+            # so retry row by row
+            for row in rows:
+                try:
+                    written += self.log_validations([row])
+                except Exception as e:
+                    # Don't fail validation if logging fails - just log the error
+                    print(f"Warning: Validation logging failed: {str(e)}")
+
+    def bump_validation_count(self, license_key: str) -> None:
+        """
+        Record one successful validation for a license.
+
+        Increments are accumulated in memory and applied in bulk by
+        flush_validation_counts, so hot licenses cost one UPDATE per
+        flush window instead of one per validation.
+
+        Args:
+            license_key: The license key that was validated
+        """
+        self._start_flusher()
+
+        with _bumps_lock:
+            _bumps[license_key] += 1
+
+    def flush_validation_counts(self) -> int:
+        """
+        Apply accumulated validation counter increments.
+
+        All pending increments are sent in a single call to the
+        bump_validation_counts database function, which also updates
+        last_validated_at. Increments are kept for the next flush if
+        the call fails.
+
+        Returns:
+            Number of licenses updated
+        """
+        global _bumps, _last_bump_flush
+
+        with _bumps_lock:
+            _last_bump_flush = time.monotonic()
+            if not _bumps:
+                return 0
+            pending, _bumps = _bumps, defaultdict(int)
+
+        try:
+            self.client.rpc('bump_validation_counts', {
+                'license_keys': list(pending.keys()),
+                'deltas': list(pending.values())
+            }).execute()
+            return len(pending)
         except Exception as e:
-            # Don't fail validation if logging fails - just log the error
-            print(f"Warning: Validation logging failed: {str(e)}")
-            return {}
+            # Don't fail validation if the update fails - retry on next flush
+            print(f"Warning: Failed to update validation counts: {str(e)}")
+            with _bumps_lock:
+                for license_key, delta in pending.items():
+                    _bumps[license_key] += delta
+            return 0
+
+    def flush_due_validation_counts(self) -> int:
+        """
+        Apply accumulated validation counter increments if the last flush
+        was at least BUMP_FLUSH_INTERVAL seconds ago.
+
+        Request handlers call this before returning: a serverless instance
+        can be frozen or recycled once it has responded, before the
+        background flusher runs, and atexit handlers do not run then.
+        Increments made since the last flush of a recycled instance are
+        still lost.
+
+        Returns:
+            Number of licenses updated
+        """
+        if time.monotonic() - _last_bump_flush < BUMP_FLUSH_INTERVAL:
+            return 0
+
+        return self.flush_validation_counts()
+
+    def _start_flusher(self) -> None:
+        """Start the background log and counter flusher once per process."""
+        global _flusher
+
+        if _flusher is not None:
+            return
+
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(
+                    target=self._run_flusher,
+                    name='validation-flusher',
+                    daemon=True
+                )
+                _flusher.start()
+                atexit.register(self.flush_validation_counts)
+                atexit.register(self.flush_validation_logs)
+
+    def _run_flusher(self) -> None:
+        """Flush logs every LOG_FLUSH_INTERVAL and counters every BUMP_FLUSH_INTERVAL seconds."""
+        while True:
+            _log_wakeup.wait(LOG_FLUSH_INTERVAL)
+            _log_wakeup.clear()
+            self.flush_validation_logs()
+            self.flush_due_validation_counts()
 
     def get_license_by_subscription(self, subscription_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -194,20 +721,33 @@ class Database:
         Raises:
             Exception: If database query fails
         """
-        try:
-            response = self.client.table('licenses').select('*').eq(
-                'stripe_subscription_id', subscription_id
-            ).execute()
+        return self._lookup_license('stripe_subscription_id', subscription_id)
 
-            if response.data and len(response.data) > 0:
-                return response.data[0]
-            else:
-                return None
+    def get_license_by_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the license created for a Stripe Checkout session.
 
-        except Exception as e:
-            raise Exception(f"Database query failed: {str(e)}")
+        This lets license generation detect that a checkout event was
+        already processed (e.g. a retried job or a redelivered webhook).
+
+        Args:
+            session_id: Stripe Checkout session ID (cs_xxxxx), as stored in
+                metadata.stripe_session_id
 
-    def update_license_status(self, license_key: str, new_status: str) -> Dict[str, Any]:
+        Returns:
+            Dict containing license data if found, None otherwise
+
+        Raises:
+            Exception: If database query fails
+        """
+        return self._lookup_license('metadata->>stripe_session_id', session_id)
+
+    def update_license_status(
+        self,
+        license_key: str,
+        new_status: str,
+        return_row: bool = True
+    ) -> Optional[Dict[str, Any]]:
         """
         Update license status.
 
@@ -220,24 +760,33 @@ class Database:
         Args:
             license_key: License key to update
             new_status: New status (ACTIVE, SUSPENDED, or CANCELLED)
+            return_row: Return the updated record (default: True). When
+                False, PostgREST does not send the row back.
 
         Returns:
-            Dict containing the updated license record
+            Dict containing the updated license record, or None if
+            return_row is False
 
         Raises:
             Exception: If database update fails or invalid status provided
         """
         # Validate status
-        valid_statuses = ['ACTIVE', 'SUSPENDED', 'CANCELLED']
-        if new_status not in valid_statuses:
-            raise ValueError(f"Invalid status: {new_status}. Must be one of {valid_statuses}")
+        if new_status not in VALID_STATUSES:
+            raise ValueError(f"Invalid status: {new_status}. {_VALID_STATUSES_ERR}")
 
         try:
             update_data = {
                 'status': new_status,
-                'last_validated_at': datetime.utcnow().isoformat()
+                'last_validated_at': _iso_now()
             }
 
+            if not return_row:
+                self.client.table('licenses').update(
+                    update_data, returning='minimal'
+                ).eq('license_key', license_key).execute()
+                print(f"✅ License {license_key} status updated to {new_status}")
+                return None
+
             response = self.client.table('licenses').update(update_data).eq(
                 'license_key', license_key
             ).execute()
@@ -250,3 +799,28 @@ class Database:
 
         except Exception as e:
             raise Exception(f"Failed to update license status: {str(e)}")
+
+
+_db: Optional[Database] = None
+
+
+def get_db() -> Database:
+    """
+    Return the process-wide Database instance.
+
+    The Supabase client is created on first use and kept for the lifetime
+    of the process, so warm serverless invocations reuse its open HTTP
+    connections instead of paying a new TLS handshake per request.
+
+    Returns:
+        The shared Database instance
+
+    Raises:
+        ValueError: If Supabase credentials are not set in environment
+    """
+    global _db
+
+    if _db is None:
+        _db = Database()
+
+    return _db
@@ -3,45 +3,45 @@ Email Sender via Resend
 
 This module handles sending license activation emails to customers
 using the Resend email service.
+
+Emails are posted to the Resend REST API through a per-thread
+requests.Session, so consecutive sends from the same worker reuse one
+keep-alive TLS connection instead of performing a new handshake each time.
+
+send_license_emails() sends many activation emails at once, up to
+RESEND_BATCH_SIZE per Resend batch request.
 """
 
+import hashlib
+import html
 import os
-from typing import Dict, Any
-import resend
+import threading
+from itertools import islice
+from string import Template
+from typing import Dict, Any, Iterable, List, Optional, Union
+import requests
 
 
-def send_license_email(email: str, license_key: str, tier: str) -> Dict[str, Any]:
-    """
-    Send license activation email to customer.
+RESEND_EMAILS_URL = 'https://api.resend.com/emails'
+RESEND_BATCH_URL = 'https://api.resend.com/emails/batch'
 
-    This sends a beautifully formatted HTML email containing:
-    - The license key
-    - Activation instructions
-    - CLI usage examples
-    - Support information
+# Seconds to wait for the Resend API
+RESEND_TIMEOUT = 10
 
-    Args:
-        email: Customer email address
-        license_key: The generated license key
-        tier: License tier (EARLY_ACCESS, STARTER, PRO, ENTERPRISE)
+# Resolved once per process; checked when an email is sent, so importing
+# this module never fails on a missing key
+_RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
 
-    Returns:
-        Dict containing Resend API response
+# Maximum emails per batch request (Resend API limit)
+RESEND_BATCH_SIZE = 100
 
-    Raises:
-        Exception: If email sending fails
-    """
-    # Set Resend API key
-    resend.api_key = os.environ.get('RESEND_API_KEY')
+# Statuses with which Resend rejects a request that failed validation,
+# in which case none of a batch's emails was sent
+RESEND_REJECTED_STATUSES = frozenset({400, 422})
 
-    if not resend.api_key:
-        raise ValueError("RESEND_API_KEY must be set in environment")
-
-    # Format tier name for display
-    tier_display = tier.replace('_', ' ').title()
-
-    # Create HTML email template
-    html_content = f"""
+# Activation email bodies per locale, parsed once at import. Placeholders:
+# $license_key, $tier_display and $email (HTML-escaped in the HTML body).
+_HTML_FR = Template("""
 <!DOCTYPE html>
 <html lang="fr">
 <head>
@@ -58,11 +58,11 @@ def send_license_email(email: str, license_key: str, tier: str) -> Dict[str, Any
     <div style="background: #ffffff; padding: 40px 30px; border: 1px solid #e0e0e0; border-top: none; border-radius: 0 0 10px 10px;">
         <h2 style="color: #333; margin-top: 0;">Votre Licence est Prête ! 🚀</h2>
 
-        <p>Merci d'avoir souscrit à Complio <strong>{tier_display}</strong>. Votre licence a été activée et est prête à l'emploi.</p>
+        <p>Merci d'avoir souscrit à Complio <strong>$tier_display</strong>. Votre licence a été activée et est prête à l'emploi.</p>
 
         <div style="background: #f8f9fa; border-left: 4px solid #667eea; padding: 20px; margin: 30px 0; border-radius: 4px;">
             <p style="margin: 0 0 10px 0; color: #666; font-size: 14px; text-transform: uppercase; letter-spacing: 1px;">Votre Clé de Licence</p>
-            <code style="font-family: 'Courier New', Courier, monospace; font-size: 18px; color: #667eea; font-weight: bold; word-break: break-all;">{license_key}</code>
+            <code style="font-family: 'Courier New', Courier, monospace; font-size: 18px; color: #667eea; font-weight: bold; word-break: break-all;">$license_key</code>
         </div>
 
         <h3 style="color: #333; margin-top: 30px;">📦 Premiers Pas</h3>
@@ -74,7 +74,7 @@ def send_license_email(email: str, license_key: str, tier: str) -> Dict[str, Any
 
         <p><strong>Étape 2 : Activer Votre Licence</strong></p>
         <div style="background: #2d3748; color: #fff; padding: 15px; border-radius: 6px; margin: 10px 0;">
-            <code style="font-family: 'Courier New', Courier, monospace;">complio activate --license-key {license_key}</code>
+            <code style="font-family: 'Courier New', Courier, monospace;">complio activate --license-key $license_key</code>
         </div>
 
         <p><strong>Étape 3 : Lancer Votre Premier Scan de Conformité</strong></p>
@@ -88,8 +88,8 @@ def send_license_email(email: str, license_key: str, tier: str) -> Dict[str, Any
 
         <h3 style="color: #333; margin-top: 30px;">🔐 Informations de Licence</h3>
         <ul style="color: #666; line-height: 1.8;">
-            <li><strong>Formule :</strong> {tier_display}</li>
-            <li><strong>Email :</strong> {email}</li>
+            <li><strong>Formule :</strong> $tier_display</li>
+            <li><strong>Email :</strong> $email</li>
             <li><strong>Statut :</strong> Active</li>
         </ul>
 
@@ -106,16 +106,83 @@ def send_license_email(email: str, license_key: str, tier: str) -> Dict[str, Any
     </div>
 </body>
 </html>
-    """
+    """)
+
+_HTML_EN = Template("""
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Your Complio License Key</title>
+</head>
+<body style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 40px 20px; text-align: center; border-radius: 10px 10px 0 0;">
+        <h1 style="color: white; margin: 0; font-size: 28px;">🎉 Welcome to Complio!</h1>
+        <p style="color: #f0f0f0; margin: 10px 0 0 0; font-size: 16px;">Your ISO 27001 Compliance Solution for AWS</p>
+    </div>
+
+    <div style="background: #ffffff; padding: 40px 30px; border: 1px solid #e0e0e0; border-top: none; border-radius: 0 0 10px 10px;">
+        <h2 style="color: #333; margin-top: 0;">Your License is Ready! 🚀</h2>
+
+        <p>Thank you for subscribing to Complio <strong>$tier_display</strong>. Your license has been activated and is ready to use.</p>
 
-    # Plain text version for email clients that don't support HTML
-    text_content = f"""
+        <div style="background: #f8f9fa; border-left: 4px solid #667eea; padding: 20px; margin: 30px 0; border-radius: 4px;">
+            <p style="margin: 0 0 10px 0; color: #666; font-size: 14px; text-transform: uppercase; letter-spacing: 1px;">Your License Key</p>
+            <code style="font-family: 'Courier New', Courier, monospace; font-size: 18px; color: #667eea; font-weight: bold; word-break: break-all;">$license_key</code>
+        </div>
+
+        <h3 style="color: #333; margin-top: 30px;">📦 Getting Started</h3>
+
+        <p><strong>Step 1: Install Complio CLI</strong></p>
+        <div style="background: #2d3748; color: #fff; padding: 15px; border-radius: 6px; margin: 10px 0;">
+            <code style="font-family: 'Courier New', Courier, monospace;">pip install complio</code>
+        </div>
+
+        <p><strong>Step 2: Activate Your License</strong></p>
+        <div style="background: #2d3748; color: #fff; padding: 15px; border-radius: 6px; margin: 10px 0;">
+            <code style="font-family: 'Courier New', Courier, monospace;">complio activate --license-key $license_key</code>
+        </div>
+
+        <p><strong>Step 3: Run Your First Compliance Scan</strong></p>
+        <div style="background: #2d3748; color: #fff; padding: 15px; border-radius: 6px; margin: 10px 0;">
+            <code style="font-family: 'Courier New', Courier, monospace;">complio scan --region eu-west-3</code>
+        </div>
+
+        <div style="background: #e6fffa; border-left: 4px solid #38b2ac; padding: 20px; margin: 30px 0; border-radius: 4px;">
+            <p style="margin: 0; color: #234e52;"><strong>💡 Tip:</strong> Run <code style="background: #b2f5ea; padding: 2px 6px; border-radius: 3px;">complio --help</code> to see all available commands and options.</p>
+        </div>
+
+        <h3 style="color: #333; margin-top: 30px;">🔐 License Information</h3>
+        <ul style="color: #666; line-height: 1.8;">
+            <li><strong>Plan:</strong> $tier_display</li>
+            <li><strong>Email:</strong> $email</li>
+            <li><strong>Status:</strong> Active</li>
+        </ul>
+
+        <h3 style="color: #333; margin-top: 30px;">📚 Resources</h3>
+        <ul style="color: #666; line-height: 1.8;">
+            <li><a href="https://www.complio.tech/documentation/getting-started/introduction" style="color: #667eea; text-decoration: none;">📖 Documentation</a></li>
+        </ul>
+
+        <hr style="border: none; border-top: 1px solid #e0e0e0; margin: 30px 0;">
+
+        <p style="color: #999; font-size: 12px; margin: 20px 0 0 0;">
+            This license key is personal and confidential. Do not share it with anyone.
+        </p>
+    </div>
+</body>
+</html>
+    """)
+
+# Plain text versions for email clients that don't support HTML
+_TEXT_FR = Template("""
 Bienvenue sur Complio !
 
-Votre Clé de Licence : {license_key}
+Votre Clé de Licence : $license_key
 
-Formule : {tier_display}
-Email : {email}
+Formule : $tier_display
+Email : $email
 Statut : Active
 
 Premiers Pas :
@@ -124,7 +191,7 @@ Premiers Pas :
    pip install complio
 
 2. Activer Votre Licence :
-   complio activate --license-key {license_key}
+   complio activate --license-key $license_key
 
 3. Lancer Votre Premier Scan de Conformité :
    complio scan --region eu-west-3
@@ -133,20 +200,279 @@ Ressources :
 - Documentation : https://www.complio.tech/documentation/getting-started/introduction
 
 Cette clé de licence est personnelle et confidentielle. Ne la partagez pas avec d'autres personnes.
+    """)
+
+_TEXT_EN = Template("""
+Welcome to Complio!
+
+Your License Key: $license_key
+
+Plan: $tier_display
+Email: $email
+Status: Active
+
+Getting Started:
+
+1. Install Complio CLI:
+   pip install complio
+
+2. Activate Your License:
+   complio activate --license-key $license_key
+
+3. Run Your First Compliance Scan:
+   complio scan --region eu-west-3
+
+Resources:
+- Documentation: https://www.complio.tech/documentation/getting-started/introduction
+
+This license key is personal and confidential. Do not share it with anyone.
+    """)
+
+_TEMPLATES = {
+    'fr': {
+        'subject': Template('🎉 Votre Licence Complio $tier_display est Prête !'),
+        'html': _HTML_FR,
+        'text': _TEXT_FR
+    },
+    'en': {
+        'subject': Template('🎉 Your Complio $tier_display License is Ready!'),
+        'html': _HTML_EN,
+        'text': _TEXT_EN
+    }
+}
+
+# Locale used when the customer's locale is unknown or has no template
+DEFAULT_LOCALE = 'fr'
+
+# Display names for the known license tiers
+TIER_DISPLAY_NAMES = {
+    'EARLY_ACCESS': 'Early Access',
+    'STARTER': 'Starter',
+    'PRO': 'Pro',
+    'ENTERPRISE': 'Enterprise'
+}
+
+_tls = threading.local()
+
+
+def _session() -> requests.Session:
+    """Return this thread's keep-alive HTTP session for the Resend API."""
+    session = getattr(_tls, 'session', None)
+
+    if session is None:
+        session = requests.Session()
+        _tls.session = session
+
+    return session
+
+
+def _email_idempotency_key(license_key: str) -> str:
+    """Return the Resend Idempotency-Key for a license's activation email."""
+    return f'license-email/{license_key}'
+
+
+def _batch_idempotency_key(license_keys: List[str]) -> str:
+    """Return the Resend Idempotency-Key for a batch of activation emails."""
+    digest = hashlib.sha256('\n'.join(license_keys).encode('utf-8')).hexdigest()
+    return f'license-email-batch/{digest}'
+
+
+def _post_email(
+    params: Union[Dict[str, Any], List[Dict[str, Any]]],
+    api_key: str,
+    idempotency_key: str,
+    url: str = RESEND_EMAILS_URL
+) -> Dict[str, Any]:
+    """
+    Send one email (or a batch of emails) through the Resend API.
+
+    A connection error on a reused keep-alive connection is retried once
+    on a fresh session. The connection may also have dropped after
+    Resend accepted the request, so every request carries an
+    Idempotency-Key and Resend does not send a repeated request again.
+
+    Args:
+        params: Resend email parameters (from, to, subject, html, text),
+            or a list of them when posting to RESEND_BATCH_URL
+        api_key: Resend API key
+        idempotency_key: Key identifying the email(s), the same on every
+            attempt to send them
+        url: Resend endpoint to post to
+
+    Returns:
+        Dict containing Resend API response
+
+    Raises:
+        requests.HTTPError: If Resend answers with an error status
+        Exception: If the API call fails
+    """
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Idempotency-Key': idempotency_key
+    }
+
+    try:
+        response = _session().post(
+            url, json=params, headers=headers, timeout=RESEND_TIMEOUT
+        )
+    except requests.ConnectionError:
+        _tls.session = None
+        response = _session().post(
+            url, json=params, headers=headers, timeout=RESEND_TIMEOUT
+        )
+
+    if response.status_code >= 400:
+        raise requests.HTTPError(
+            f"Resend API error {response.status_code}: {response.text}",
+            response=response
+        )
+
+    return response.json()
+
+
+def send_license_email(
+    email: str,
+    license_key: str,
+    tier: str,
+    locale: Optional[str] = None
+) -> Dict[str, Any]:
     """
+    Send license activation email to customer.
+
+    This sends a beautifully formatted HTML email containing:
+    - The license key
+    - Activation instructions
+    - CLI usage examples
+    - Support information
+
+    Args:
+        email: Customer email address
+        license_key: The generated license key
+        tier: License tier (EARLY_ACCESS, STARTER, PRO, ENTERPRISE)
+        locale: Customer locale, e.g. 'en' or 'fr-FR' (default: DEFAULT_LOCALE)
+
+    Returns:
+        Dict containing Resend API response
+
+    Raises:
+        Exception: If email sending fails
+    """
+    api_key = _RESEND_API_KEY
+
+    if not api_key:
+        raise ValueError("RESEND_API_KEY must be set in environment")
 
     try:
         # Send email via Resend
-        params = {
-            "from": "Complio <andy.piquionne@complio.tech>",
-            "to": [email],
-            "subject": f"🎉 Votre Licence Complio {tier_display} est Prête !",
-            "html": html_content,
-            "text": text_content,
-        }
-
-        response = resend.Emails.send(params)
+        response = _post_email(
+            _license_email_params(email, license_key, tier, locale),
+            api_key,
+            _email_idempotency_key(license_key)
+        )
         return response
 
     except Exception as e:
         raise Exception(f"Failed to send email: {str(e)}")
+
+
+def _license_email_params(
+    email: str,
+    license_key: str,
+    tier: str,
+    locale: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build the Resend parameters for a license activation email."""
+    # 'fr-FR' -> 'fr'; unknown locales fall back to DEFAULT_LOCALE
+    language = (locale or DEFAULT_LOCALE).split('-')[0].lower()
+    templates = _TEMPLATES.get(language) or _TEMPLATES[DEFAULT_LOCALE]
+
+    # Format tier name for display
+    tier_display = TIER_DISPLAY_NAMES.get(tier) or tier.replace('_', ' ').title()
+
+    html_content = templates['html'].substitute(
+        license_key=license_key,
+        tier_display=tier_display,
+        email=html.escape(email)
+    )
+    text_content = templates['text'].substitute(
+        license_key=license_key,
+        tier_display=tier_display,
+        email=email
+    )
+
+    return {
+        "from": "Complio <andy.piquionne@complio.tech>",
+        "to": [email],
+        "subject": templates['subject'].substitute(tier_display=tier_display),
+        "html": html_content,
+        "text": text_content,
+    }
+
+
+def send_license_emails(licenses: Iterable[Dict[str, Any]]) -> int:
+    """
+    Send activation emails for many licenses, e.g. after bulk provisioning.
+
+    Emails are posted synchronously, up to RESEND_BATCH_SIZE per Resend
+    batch request. Failures are logged, not raised.
+
+    Args:
+        licenses: License records with email, license_key, tier and an
+            optional locale
+
+    Returns:
+        Number of emails sent
+    """
+    licenses = iter(licenses)
+    sent = 0
+
+    while True:
+        chunk = list(islice(licenses, RESEND_BATCH_SIZE))
+        if not chunk:
+            return sent
+
+        license_keys = [license_data['license_key'] for license_data in chunk]
+        batch = [
+            _license_email_params(
+                license_data['email'],
+                license_data['license_key'],
+                license_data['tier'],
+                license_data.get('locale')
+            )
+            for license_data in chunk
+        ]
+        sent += _send_batch(license_keys, batch)
+
+
+def _send_batch(license_keys: List[str], batch: List[Dict[str, Any]]) -> int:
+    """Send a batch of emails, falling back to one request per email if it is rejected."""
+    api_key = _RESEND_API_KEY
+
+    if not api_key:
+        print(f"Warning: RESEND_API_KEY not set, dropping {len(batch)} email(s)")
+        return 0
+
+    try:
+        _post_email(batch, api_key, _batch_idempotency_key(license_keys), RESEND_BATCH_URL)
+        return len(batch)
+    except requests.HTTPError as e:
+        print(f"Warning: Batched email send failed: {str(e)}")
+        if e.response.status_code not in RESEND_REJECTED_STATUSES:
+            return 0
+    except Exception as e:
+        # A timeout or dropped connection may come after Resend accepted
+        # the batch, so resending its emails could deliver them twice
+        print(f"Warning: Batched email send failed: {str(e)}")
+        return 0
+
+    # The batch is rejected as a whole if any email is invalid, so retry
+    # each email on its own
+    sent = 0
+    for license_key, params in zip(license_keys, batch):
+        try:
+            _post_email(params, api_key, _email_idempotency_key(license_key))
+            sent += 1
+        except Exception as e:
+            print(f"Warning: Failed to send email to {params['to'][0]}: {str(e)}")
+
+    return sent
@@ -0,0 +1,42 @@
+"""
+HTTP Response Helpers
+
+This module writes complete HTTP responses for the serverless handlers.
+BaseHTTPRequestHandler's send_response/send_header/end_headers sequence
+issues separate writes for the headers and the body; building the whole
+response up front sends it with a single write.
+"""
+
+from http.server import BaseHTTPRequestHandler
+
+
+JSON_CONTENT_TYPE = b'Content-Type: application/json\r\n'
+
+CORS_HEADERS = b'Access-Control-Allow-Origin: *\r\n'
+
+
+def write_response(
+    request_handler: BaseHTTPRequestHandler,
+    status_code: int,
+    body: bytes,
+    headers: bytes = JSON_CONTENT_TYPE
+) -> None:
+    """
+    Write a full HTTP response (status line, headers and body) in one call.
+
+    Args:
+        request_handler: The handler serving the current request
+        status_code: HTTP status code
+        body: Encoded response body
+        headers: Pre-encoded header lines, each terminated by CRLF
+    """
+    request_handler.log_request(status_code)
+
+    reason = request_handler.responses.get(status_code, ('',))[0]
+
+    request_handler.wfile.write(b''.join((
+        f"{request_handler.protocol_version} {status_code} {reason}\r\n".encode('latin-1'),
+        headers,
+        b'Content-Length: %d\r\n\r\n' % len(body),
+        body
+    )))
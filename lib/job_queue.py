@@ -0,0 +1,112 @@
+"""
+Background Job Queue
+
+This module enqueues license generation and activation email jobs on a
+Redis-backed RQ queue so the Stripe webhook can acknowledge events without
+waiting on the database and email round-trips.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from redis import Redis
+from rq import Queue, Retry
+from rq.job import Job
+
+
+LICENSE_QUEUE_NAME = 'licenses'
+
+# Seconds to wait on Redis before the webhook falls back to inline
+# processing, well within Stripe's webhook response deadline
+REDIS_SOCKET_TIMEOUT = 2
+
+_queue: Optional[Queue] = None
+
+
+def get_license_queue() -> Optional[Queue]:
+    """
+    Return the shared license job queue.
+
+    The Redis connection is created once per process and reused by
+    every warm invocation.
+
+    Returns:
+        The RQ queue, or None if REDIS_URL is not configured
+    """
+    global _queue
+
+    if _queue is None:
+        redis_url = os.environ.get('REDIS_URL')
+        if not redis_url:
+            return None
+        _queue = Queue(LICENSE_QUEUE_NAME, connection=Redis.from_url(
+            redis_url,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT
+        ))
+
+    return _queue
+
+
+def enqueue_license_job(event: Dict[str, Any]) -> Optional[Job]:
+    """
+    Enqueue a verified checkout.session.completed event for processing.
+
+    The job is picked up by an `rq worker licenses` process which runs
+    lib.license_jobs.process_checkout.
+
+    Args:
+        event: The verified Stripe event, as a plain dictionary
+
+    Returns:
+        The enqueued RQ job, or None if no queue is configured (in which
+        case the caller should process the event inline)
+    """
+    queue = get_license_queue()
+
+    if queue is None:
+        return None
+
+    return queue.enqueue(
+        'lib.license_jobs.process_checkout',
+        event,
+        job_timeout=120,
+        retry=Retry(max=3, interval=[10, 30, 60])
+    )
+
+
+def enqueue_email_job(
+    email: str,
+    license_key: str,
+    tier: str,
+    locale: Optional[str] = None
+) -> Optional[Job]:
+    """
+    Enqueue an activation email for a newly created license.
+
+    Emails are queued separately from license generation so a failed send
+    is retried on its own without generating another license.
+
+    Args:
+        email: Customer email address
+        license_key: The generated license key
+        tier: License tier
+        locale: Customer locale for the email (optional)
+
+    Returns:
+        The enqueued RQ job, or None if no queue is configured
+    """
+    queue = get_license_queue()
+
+    if queue is None:
+        return None
+
+    return queue.enqueue(
+        'lib.email_sender.send_license_email',
+        email,
+        license_key,
+        tier,
+        locale,
+        job_timeout=60,
+        retry=Retry(max=3, interval=[10, 30, 60])
+    )
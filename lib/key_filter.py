@@ -0,0 +1,133 @@
+"""
+Known License Key Filter
+
+This module keeps an in-process Bloom filter of every issued license key,
+so the validation endpoint can answer "License not found" for keys that
+were never issued (typically scanner traffic) without a database query.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from lib.database import get_db
+
+
+# Incremental refreshes re-read licenses created this long before the
+# previous refresh started, to cover clock skew and in-flight inserts
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter for strings.
+
+    Membership tests never return false negatives; false positives occur
+    at roughly error_rate once capacity items have been added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Allocate the bit array for the given capacity and error rate.
+
+        Args:
+            capacity: Expected number of items
+            error_rate: Target false positive rate at capacity
+        """
+        self.size = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> List[int]:
+        """Derive the item's bit positions from one BLAKE2b digest (double hashing)."""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> None:
+        """Add an item to the filter."""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class KnownLicenseKeys:
+    """
+    Bloom filter of issued license keys, loaded from the database.
+
+    All keys are loaded on first use. Licenses are created by the webhook
+    in a different process, so a key missing from the filter triggers an
+    incremental refresh (licenses created since the last refresh) before
+    it is reported as unknown. Refreshes run at most once per
+    refresh_interval, which bounds database load from scanner traffic.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.001,
+        refresh_interval: float = 1.0
+    ):
+        """
+        Create an empty filter; keys are loaded lazily on the first miss.
+
+        Args:
+            capacity: Expected number of issued license keys
+            error_rate: Target false positive rate at capacity
+            refresh_interval: Minimum seconds between database refreshes
+        """
+        self._filter = BloomFilter(capacity, error_rate)
+        self._refresh_interval = refresh_interval
+        self._created_since: Optional[str] = None
+        self._last_refresh = float('-inf')
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def might_exist(self, license_key: str) -> bool:
+        """
+        Check whether a license key may have been issued.
+
+        Args:
+            license_key: The license key to check
+
+        Returns:
+            bool: False only if the key was definitely never issued. True
+            if it may exist, or if the filter could not be loaded.
+        """
+        if license_key in self._filter:
+            return True
+
+        self._refresh()
+
+        # Until the initial load succeeds, defer to the database
+        return not self._loaded or license_key in self._filter
+
+    def _refresh(self) -> None:
+        """Load license keys created since the last refresh into the filter."""
+        with self._lock:
+            if time.monotonic() - self._last_refresh < self._refresh_interval:
+                return
+
+            self._last_refresh = time.monotonic()
+            started_at = datetime.now(timezone.utc)
+
+            try:
+                rows = get_db().get_license_keys(created_since=self._created_since)
+            except Exception as e:
+                print(f"Warning: Failed to refresh license key filter: {str(e)}")
+                return
+
+            for row in rows:
+                self._filter.add(row['license_key'])
+
+            self._created_since = (started_at - REFRESH_OVERLAP).isoformat()
+            self._loaded = True
@@ -5,35 +5,119 @@ This module provides cryptographically secure license key generation
 and HMAC-SHA256 signing for the Complio licensing system.
 """
 
+import base64
 import secrets
 import hmac
 import hashlib
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+
+# License key formats: COMPL1- keys produced by generate_license_key(), and
+# legacy hex keys (COMPL-XXXX-XXXX-XXXX-XXXX) issued before them
+LICENSE_KEY_RE = re.compile(
+    r'COMPL1-[0-9A-HJKMNP-TV-Z]{4}-[0-9A-HJKMNP-TV-Z]{4}-[0-9A-HJKMNP-TV-Z]{5}'
+    r'|COMPL-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}'
+)
+
+# Maps the RFC 4648 base32 alphabet onto Crockford's base32 alphabet
+# (digits first, no I, L, O or U)
+_CROCKFORD = str.maketrans(
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567',
+    '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+)
 
 
 def generate_license_key() -> str:
     """
     Generate a cryptographically secure license key.
 
-    Format: COMPL-XXXX-XXXX-XXXX-XXXX
-    - 4 parts of 4 hexadecimal characters each
-    - 64 bits of entropy (16 hex chars = 64 bits)
+    Format: COMPL1-XXXX-XXXX-XXXXX
+    - 13 Crockford base32 characters, grouped 4-4-5
+    - 64 bits of entropy (5 bits per character)
+    - The "1" in the prefix is the key format version; legacy keys use
+      COMPL-XXXX-XXXX-XXXX-XXXX (hex) and remain valid
 
     Returns:
-        str: License key in format COMPL-XXXX-XXXX-XXXX-XXXX
+        str: License key in format COMPL1-XXXX-XXXX-XXXXX
     """
     # Generate 8 bytes (64 bits) of cryptographically secure random data
-    random_bytes = secrets.token_bytes(8)
+    return _format_key(secrets.token_bytes(8))
+
+
+def _format_key(random_bytes: bytes) -> str:
+    """Format 8 random bytes as a COMPL1-XXXX-XXXX-XXXXX license key."""
+    # 8 bytes encode to 13 base32 characters plus 3 '=' of padding
+    encoded = base64.b32encode(random_bytes)[:13].decode('ascii').translate(_CROCKFORD)
+
+    return f"COMPL1-{encoded[:4]}-{encoded[4:8]}-{encoded[8:]}"
+
+
+def generate_license_keys(count: int) -> List[str]:
+    """
+    Generate many license keys at once, e.g. for bulk provisioning.
+
+    Randomness for all keys is drawn with a single CSPRNG call instead
+    of once per key.
+
+    Args:
+        count: Number of license keys to generate
+
+    Returns:
+        List[str]: License keys in format COMPL1-XXXX-XXXX-XXXXX
+    """
+    random_bytes = secrets.token_bytes(8 * count)
+
+    return [_format_key(random_bytes[i:i+8]) for i in range(0, 8 * count, 8)]
+
+
+# SHA-256 block size; HMAC keys are padded (or hashed) to this length
+_BLOCK_SIZE = 64
+
+# HMAC inner/outer padding bytes, as translation tables over a key byte
+_IPAD = bytes(x ^ 0x36 for x in range(256))
+_OPAD = bytes(x ^ 0x5C for x in range(256))
 
-    # Convert to hexadecimal string (16 characters)
-    hex_string = random_bytes.hex().upper()
 
-    # Split into 4 parts of 4 characters each
-    parts = [hex_string[i:i+4] for i in range(0, 16, 4)]
+@lru_cache(maxsize=4)
+def _pad_states(signing_key: str) -> Tuple["hashlib._Hash", "hashlib._Hash"]:
+    """
+    Return SHA-256 states that have already absorbed the HMAC key pads.
+
+    HMAC-SHA256(K, m) = H((K ^ opad) || H((K ^ ipad) || m)). The padded
+    keys are exactly one SHA-256 block, so hashing them is a fixed
+    compression per call; doing it once per signing key means each
+    signature only hashes the message and the inner digest, starting
+    from a .copy() of these states.
+
+    Args:
+        signing_key: Secret signing key (hex string)
+
+    Returns:
+        Tuple of (inner, outer) hash states that must not be updated directly
+    """
+    key = bytes.fromhex(signing_key)
+
+    if len(key) > _BLOCK_SIZE:
+        key = hashlib.sha256(key).digest()
+
+    key = key.ljust(_BLOCK_SIZE, b'\0')
 
-    # Format as COMPL-XXXX-XXXX-XXXX-XXXX
-    license_key = f"COMPL-{'-'.join(parts)}"
+    return hashlib.sha256(key.translate(_IPAD)), hashlib.sha256(key.translate(_OPAD))
 
-    return license_key
+
+def _hmac_hexdigest(signing_key: str, message: bytes) -> str:
+    """Compute HMAC-SHA256(signing_key, message) from the precomputed pad states."""
+    inner_state, outer_state = _pad_states(signing_key)
+
+    inner = inner_state.copy()
+    inner.update(message)
+
+    outer = outer_state.copy()
+    outer.update(inner.digest())
+
+    return outer.hexdigest()
 
 
 def sign_license(license_key: str, email: str, tier: str, signing_key: str) -> str:
@@ -47,7 +131,7 @@ def sign_license(license_key: str, email: str, tier: str, signing_key: str) -> s
     - tier
 
     Args:
-        license_key: The license key (e.g., COMPL-XXXX-XXXX-XXXX-XXXX)
+        license_key: The license key (e.g., COMPL1-XXXX-XXXX-XXXXX)
         email: Customer email address
         tier: License tier (EARLY_ACCESS, STARTER, PRO, ENTERPRISE)
         signing_key: Secret signing key (hex string)
@@ -58,17 +142,8 @@ def sign_license(license_key: str, email: str, tier: str, signing_key: str) -> s
     # Create message by concatenating license components
     message = f"{license_key}|{email}|{tier}"
 
-    # Convert signing key from hex to bytes
-    key_bytes = bytes.fromhex(signing_key)
-
-    # Compute HMAC-SHA256
-    signature = hmac.new(
-        key_bytes,
-        message.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
-
-    return signature
+    # Compute HMAC-SHA256 from the precomputed key pad states
+    return _hmac_hexdigest(signing_key, message.encode('utf-8'))
 
 
 def verify_signature(
@@ -94,8 +169,19 @@ def verify_signature(
     Returns:
         bool: True if signature is valid, False otherwise
     """
-    # Generate expected signature
-    expected_signature = sign_license(license_key, email, tier, signing_key)
+    # A signature that is not 64 hex characters can never match; reject it
+    # before any hashing (its length and alphabet are not secret)
+    if not isinstance(signature, str) or len(signature) != 64:
+        return False
+
+    try:
+        bytes.fromhex(signature)
+    except ValueError:
+        return False
+
+    # Generate expected signature from the precomputed key pad states
+    message = f"{license_key}|{email}|{tier}"
+    expected_signature = _hmac_hexdigest(signing_key, message.encode('utf-8'))
 
     # Use constant-time comparison to prevent timing attacks
     return hmac.compare_digest(signature, expected_signature)
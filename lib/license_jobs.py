@@ -0,0 +1,242 @@
+"""
+License Generation Jobs
+
+This module contains the work done for a Stripe checkout.session.completed
+event: generating and signing the license key, storing it in the database,
+and dispatching the activation email.
+
+It runs either inside an RQ worker (`rq worker licenses`) or inline in the
+webhook handler when no queue is configured.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from lib.license_generator import generate_license_key, sign_license
+from lib.database import get_db
+from lib.email_sender import send_license_email
+from lib.job_queue import enqueue_email_job
+
+
+# Child of the webhook logger, so DEBUG_WEBHOOK also enables debug output here
+log = logging.getLogger('generate_license.jobs')
+
+
+def _safe_send(
+    email: str,
+    license_key: str,
+    tier: str,
+    locale: Optional[str] = None
+) -> None:
+    """Send an activation email, logging instead of raising on failure."""
+    try:
+        send_license_email(email, license_key, tier, locale)
+        log.debug("✅ Activation email sent to %s", email)
+    except Exception:
+        # License is already created, email can be resent manually
+        log.warning("⚠️  Failed to send email to %s", email, exc_info=True)
+
+
+def dispatch_license_email(
+    email: str,
+    license_key: str,
+    tier: str,
+    locale: Optional[str] = None
+) -> None:
+    """
+    Send the activation email, off the request path where that is safe.
+
+    The email is queued as its own RQ job when REDIS_URL is configured.
+    Otherwise it is sent before returning: neither a serverless instance,
+    which may be frozen once the response is sent, nor an RQ work horse,
+    which exits with os._exit() after its job, would let a background
+    thread deliver it. Send failures are logged, not raised: the license
+    is already created and the email can be resent manually.
+
+    Args:
+        email: Customer email address
+        license_key: The generated license key
+        tier: License tier
+        locale: Customer locale for the email (optional)
+    """
+    try:
+        if enqueue_email_job(email, license_key, tier, locale) is not None:
+            return
+    except Exception:
+        log.warning("⚠️  Failed to enqueue email job, sending directly", exc_info=True)
+
+    _safe_send(email, license_key, tier, locale)
+
+
+def _reuse_license(
+    license_data: Dict[str, Any],
+    stripe_session_id: str,
+    locale: Optional[str] = None
+) -> Dict[str, Any]:
+    """Dispatch the email of a license already created for a checkout session."""
+    log.info(
+        "ℹ️  License already created for session %s: %s",
+        stripe_session_id, license_data['license_key']
+    )
+    dispatch_license_email(
+        license_data['email'], license_data['license_key'], license_data['tier'], locale
+    )
+
+    return {
+        'license_key': license_data['license_key'],
+        'email': license_data['email'],
+        'tier': license_data['tier']
+    }
+
+
+def process_checkout(event: Dict[str, Any], signing_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Generate and store a license for a completed checkout session.
+
+    The activation email is dispatched with dispatch_license_email and
+    never fails this call; without a job queue it is sent before this
+    call returns.
+
+    Processing is idempotent per checkout session: if a license already
+    exists for the session (a retried job or a redelivered webhook whose
+    earlier attempt committed the insert), its activation email is
+    dispatched again and no second license is created. The unique
+    idx_licenses_stripe_session index makes this hold for concurrent
+    attempts too: the insert that loses fails, and the license stored
+    by the winner is used instead.
+
+    Args:
+        event: Verified Stripe checkout.session.completed event
+        signing_key: Secret signing key (hex string). Defaults to the
+            LICENSE_SIGNING_KEY environment variable.
+
+    Returns:
+        Dict containing license_key, email and tier of the new license
+
+    Raises:
+        ValueError: If the signing key or the customer email is missing
+        Exception: If the database lookup or insert fails
+    """
+    signing_key = signing_key or os.environ.get('LICENSE_SIGNING_KEY')
+
+    if not signing_key:
+        raise ValueError("Server configuration error: Missing LICENSE_SIGNING_KEY")
+
+    log.debug("🎯 Processing checkout.session.completed event")
+    session = event['data']['object']
+
+    # Extract customer email from Stripe session
+    # Stripe can put email in different locations depending on checkout configuration
+    customer_email = None
+
+    # Try customer_details first (most common in Checkout Sessions)
+    if session.get('customer_details'):
+        customer_email = session['customer_details'].get('email')
+        if customer_email:
+            log.debug("📧 Email found in customer_details: %s", customer_email)
+
+    # Fallback to customer_email field (legacy/alternative location)
+    if not customer_email:
+        customer_email = session.get('customer_email')
+        if customer_email:
+            log.debug("📧 Email found in customer_email field: %s", customer_email)
+
+    # If still no email, check if we have a customer ID
+    customer_id = session.get('customer')
+    subscription_id = session.get('subscription')
+
+    if not customer_email and customer_id:
+        error_msg = f"No customer email found in session. Customer ID: {customer_id}. Please ensure email collection is enabled in Stripe Checkout."
+        log.warning("❌ %s", error_msg)
+        log.debug("Customer details: %s", session.get('customer_details'))
+        raise ValueError(error_msg)
+
+    if not customer_email:
+        error_msg = "Missing customer email in session"
+        log.warning("❌ %s", error_msg)
+        log.debug("Session object: %s", session)
+        raise ValueError(error_msg)
+
+    log.debug(
+        "✅ Customer email confirmed: %s (customer: %s, subscription: %s)",
+        customer_email, customer_id, subscription_id
+    )
+
+    # Extract tier from metadata (set in Stripe checkout)
+    # Default to EARLY_ACCESS tier (unlocks CLI scanning)
+    tier = session.get('metadata', {}).get('tier', 'EARLY_ACCESS')
+    log.debug("🏷️  Tier from metadata: %s", tier)
+
+    # Email language: explicit metadata, else the Checkout page locale
+    locale = session.get('metadata', {}).get('locale') or session.get('locale')
+
+    # Skip generation if an earlier attempt already stored this session's license
+    stripe_session_id = session.get('id')
+
+    try:
+        existing = get_db().get_license_by_session(stripe_session_id)
+    except Exception:
+        log.exception("❌ Database error looking up session %s", stripe_session_id)
+        raise
+
+    if existing:
+        return _reuse_license(existing, stripe_session_id, locale)
+
+    # Generate license key
+    license_key = generate_license_key()
+
+    # Generate HMAC signature
+    signature = sign_license(license_key, customer_email, tier, signing_key)
+    log.debug("✅ License key generated and signed: %s", license_key)
+
+    # Calculate expiration (30 days from now for monthly subscriptions)
+    expires = datetime.now(timezone.utc) + timedelta(days=30)
+
+    # Prepare license data for database
+    license_data = {
+        'license_key': license_key,
+        'signature': signature,
+        'email': customer_email,
+        'tier': tier,
+        'status': 'ACTIVE',
+        'stripe_customer_id': customer_id,
+        'stripe_subscription_id': subscription_id,
+        'expires_at': expires.isoformat(),
+        'validation_count': 0,
+        'metadata': {
+            'stripe_session_id': stripe_session_id,
+            'created_via': 'stripe_webhook'
+        }
+    }
+
+    # Store license in database
+    try:
+        db = get_db()
+        db.insert_license(license_data, return_row=False)
+        log.debug("✅ License stored successfully in database")
+    except Exception:
+        # A concurrent attempt for the same session may have stored its
+        # license first, failing this insert on idx_licenses_stripe_session
+        try:
+            existing = get_db().get_license_by_session(stripe_session_id)
+        except Exception:
+            existing = None
+
+        if existing:
+            return _reuse_license(existing, stripe_session_id, locale)
+
+        log.exception("❌ Database error occurred for license %s", license_key)
+        raise
+
+    # Send activation email (queued when a job queue is available)
+    dispatch_license_email(customer_email, license_key, tier, locale)
+
+    log.debug("🎉 License generation completed successfully!")
+
+    return {
+        'license_key': license_key,
+        'email': customer_email,
+        'tier': tier
+    }
@@ -0,0 +1,118 @@
+"""
+Stripe Webhook Signature Verification
+
+This module verifies Stripe-Signature headers with a one-shot
+hmac.digest() call, following the scheme documented by Stripe:
+HMAC-SHA256 over "<timestamp>.<payload>" keyed with the endpoint secret.
+"""
+
+import hmac
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import orjson
+from stripe.error import SignatureVerificationError
+
+
+# Maximum age (in seconds) of a signed event, same default as the Stripe SDK
+DEFAULT_TOLERANCE = 300
+
+EXPECTED_SCHEME = 'v1'
+
+
+@lru_cache(maxsize=4)
+def _secret_bytes(secret: str) -> bytes:
+    """Encode the webhook secret once instead of on every event."""
+    return secret.encode('utf-8')
+
+
+def _parse_header(sig_header: str) -> Tuple[int, List[str]]:
+    """
+    Split a Stripe-Signature header into its timestamp and v1 signatures.
+
+    Args:
+        sig_header: Header value, e.g. "t=1492774577,v1=5257a869...,v0=..."
+
+    Returns:
+        Tuple of (timestamp, list of v1 signatures)
+
+    Raises:
+        SignatureVerificationError: If the header has no valid timestamp
+    """
+    timestamp = None
+    signatures = []
+
+    for item in sig_header.split(','):
+        key, sep, value = item.strip().partition('=')
+        if not sep:
+            continue
+        if key == 't':
+            try:
+                timestamp = int(value)
+            except ValueError:
+                timestamp = None
+        elif key == EXPECTED_SCHEME:
+            signatures.append(value)
+
+    if timestamp is None:
+        raise SignatureVerificationError(
+            "Unable to extract timestamp and signatures from header", sig_header
+        )
+
+    return timestamp, signatures
+
+
+def construct_event(
+    payload: bytes,
+    sig_header: str,
+    secret: str,
+    tolerance: int = DEFAULT_TOLERANCE
+) -> Dict[str, Any]:
+    """
+    Verify a Stripe webhook payload and decode the event.
+
+    Drop-in replacement for stripe.Webhook.construct_event() that returns
+    the event as a plain dictionary.
+
+    Args:
+        payload: Raw request body, exactly as received
+        sig_header: Value of the Stripe-Signature header
+        secret: Webhook endpoint signing secret (whsec_...)
+        tolerance: Maximum event age in seconds (0 disables the check)
+
+    Returns:
+        Dict containing the decoded Stripe event
+
+    Raises:
+        SignatureVerificationError: If the signature is missing, invalid,
+            or the timestamp is outside the tolerance zone
+        ValueError: If the payload is not valid JSON
+    """
+    timestamp, signatures = _parse_header(sig_header)
+
+    if not signatures:
+        raise SignatureVerificationError(
+            "No signatures found with expected scheme %s for payload" % EXPECTED_SCHEME,
+            sig_header,
+            payload
+        )
+
+    signed_payload = b'%d.%s' % (timestamp, payload)
+    expected = hmac.digest(_secret_bytes(secret), signed_payload, 'sha256').hex()
+
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise SignatureVerificationError(
+            "No signatures found matching the expected signature for payload",
+            sig_header,
+            payload
+        )
+
+    if tolerance and timestamp < time.time() - tolerance:
+        raise SignatureVerificationError(
+            "Timestamp outside the tolerance zone (%d)" % timestamp,
+            sig_header,
+            payload
+        )
+
+    return orjson.loads(payload)